@@ -1,23 +1,40 @@
 from app.components.documents import documents
+from app.components.health import health
 from app.components.pdf_toolset import pdf_toolset
+from app.compression import compression
 from app.exceptions.exception_handler import handle_http_exception
-from app.extensions import db
+from app.extensions import db, object_cache, reader_cache, text_cache
+from app.jobs import job_queue
 from flask import Flask
 from werkzeug.exceptions import HTTPException
-from app.logger import logger
+from app.logger import logger, setup_logging
+from app.metrics import metrics
+from app.search import search_index
+from app.storage import storage_clients
 
 def create_app(config_class='app.config.Config'):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    setup_logging(app)
 
     db.init_app(app)
+    text_cache.init_app(app)
+    object_cache.init_app(app)
+    reader_cache.init_app(app)
+    job_queue.init_app(app)
+    storage_clients.init_app(app)
+    search_index.init_app(app)
+    metrics.init_app(app)
+    compression.init_app(app)
     app.register_error_handler(HTTPException, handle_http_exception)
 
     # modules
+    app.register_blueprint(health)
     app.register_blueprint(documents, url_prefix='/documents')
     app.register_blueprint(pdf_toolset, url_prefix='/pdf-text')
 
     with app.app_context():
         db.create_all()
+        search_index.create_all()
 
     return app
@@ -0,0 +1,448 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so the cache is only safe within one process
+    fcntl = None
+
+from flask import current_app
+import pypdf
+
+from app.logger import logger
+
+# Object downloads are serialized with one of this many lock files, picked by key hash, so
+# locks don't accumulate with cached objects.
+OBJECT_CACHE_LOCK_STRIPES = 256
+
+# Bumped whenever the way text is produced changes, so stale entries are never served.
+EXTRACTOR_VERSION = f"pypdf-{pypdf.__version__}"
+
+class MemoryCacheBackend:
+    """In-process LRU bounded by the total size (in bytes) of the cached values."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        value_size = len(value.encode('utf-8'))
+        if value_size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key).encode('utf-8'))
+
+            self._entries[key] = value
+            self.size += value_size
+
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.encode('utf-8'))
+
+    def invalidate(self, document_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == document_id]:
+                self.size -= len(self._entries.pop(key).encode('utf-8'))
+
+class DiskCacheBackend:
+    """Stores one file per entry, grouped in a folder per document."""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key[1:]).encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, str(key[0]), f"{digest}.txt")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first so readers never see a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, document_id):
+        shutil.rmtree(os.path.join(self.folder, str(document_id)), ignore_errors=True)
+
+class TieredCacheBackend:
+    """Memory in front of disk: disk hits are promoted to memory."""
+
+    def __init__(self, memory, disk):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        self.disk.set(key, value)
+
+    def invalidate(self, document_id):
+        self.memory.invalidate(document_id)
+        self.disk.invalidate(document_id)
+
+class NullCacheBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def invalidate(self, document_id):
+        pass
+
+class TextCache:
+    """
+    Cache for extracted page text, keyed by document, stored object (name
+    and path), page and extractor version. The backend is chosen per app through
+    TEXT_CACHE_BACKEND: none, memory, disk or tiered.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TEXT_CACHE_BACKEND', 'memory')
+        app.config.setdefault('TEXT_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        app.config.setdefault('TEXT_CACHE_FOLDER', os.path.join('cache', 'text'))
+
+        app.extensions['text_cache'] = self._build_backend(app.config)
+        app.extensions['text_cache_stats'] = {
+            'hits': 0,
+            'misses': 0,
+            'lock': threading.Lock(),
+        }
+
+    def _build_backend(self, config):
+        backend = config['TEXT_CACHE_BACKEND']
+
+        if backend == 'none':
+            return NullCacheBackend()
+        if backend == 'memory':
+            return MemoryCacheBackend(int(config['TEXT_CACHE_MAX_BYTES']))
+        if backend == 'disk':
+            return DiskCacheBackend(config['TEXT_CACHE_FOLDER'])
+        if backend == 'tiered':
+            return TieredCacheBackend(
+                MemoryCacheBackend(int(config['TEXT_CACHE_MAX_BYTES'])),
+                DiskCacheBackend(config['TEXT_CACHE_FOLDER'])
+            )
+
+        raise ValueError(f"Unknown TEXT_CACHE_BACKEND: {backend}")
+
+    @property
+    def backend(self):
+        return current_app.extensions['text_cache']
+
+    @staticmethod
+    def make_key(document, page, variant='text'):
+        # Both names of the stored file are part of the key: invalidate() only reaches this
+        # process's memory, so a PATCH that repoints the document must miss everywhere else.
+        return (document.id, document.unique_name, document.path, page, f"{EXTRACTOR_VERSION}:{variant}")
+
+    def get(self, document, page, variant='text'):
+        try:
+            value = self.backend.get(self.make_key(document, page, variant))
+        except Exception as e:
+            logger.error("Failed to read text cache for document %s: %s", document.id, e)
+            value = None
+
+        state = current_app.extensions['text_cache_stats']
+        with state['lock']:
+            state['hits' if value is not None else 'misses'] += 1
+        return value
+
+    def set(self, document, page, value, variant='text'):
+        try:
+            self.backend.set(self.make_key(document, page, variant), value)
+        except Exception as e:
+            logger.error("Failed to write text cache for document %s: %s", document.id, e)
+
+    def invalidate(self, document_id):
+        self.backend.invalidate(document_id)
+
+    def stats(self):
+        state = current_app.extensions['text_cache_stats']
+        return {
+            'hits': state['hits'],
+            'misses': state['misses'],
+        }
+
+class ObjectCache:
+    """
+    Bounded read-through cache of stored objects on local disk. Files are
+    written atomically and downloads of the same object are serialized
+    with file locks, so several worker processes can share one folder.
+    Least recently used files are evicted once OBJECT_CACHE_MAX_BYTES is
+    exceeded; a size of 0 disables the cache.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('OBJECT_CACHE_MAX_BYTES', 0)
+        app.config.setdefault('OBJECT_CACHE_FOLDER', os.path.join('cache', 'objects'))
+
+        app.extensions['object_cache'] = {
+            'hits': 0,
+            'misses': 0,
+            'lock': threading.Lock(),
+        }
+
+    @property
+    def enabled(self):
+        return int(current_app.config['OBJECT_CACHE_MAX_BYTES']) > 0
+
+    @property
+    def folder(self):
+        return current_app.config['OBJECT_CACHE_FOLDER']
+
+    def _path(self, key):
+        return os.path.join(self.folder, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+    def _lock_path(self, path):
+        stripe = int(os.path.basename(path)[:8], 16) % OBJECT_CACHE_LOCK_STRIPES
+        return os.path.join(self.folder, f'.lock-{stripe}')
+
+    def get_path(self, key, fetch):
+        """
+        Return the local path of the object stored under `key`, calling
+        fetch(file) to download it on a miss.
+        """
+        path = self._path(key)
+
+        if self._touch(path):
+            self._count('hits')
+            return path
+
+        os.makedirs(self.folder, exist_ok=True)
+        with _file_lock(self._lock_path(path)):
+            # Another worker may have downloaded it while we waited for the lock.
+            if self._touch(path):
+                self._count('hits')
+                return path
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.folder, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    fetch(f)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        self._count('misses')
+        self.evict(keep=path)
+        return path
+
+    def invalidate(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used files until the folder fits in
+        OBJECT_CACHE_MAX_BYTES. `keep` is never removed, so an object larger
+        than the whole cache is still there for the caller that fetched it.
+        """
+        max_bytes = int(current_app.config['OBJECT_CACHE_MAX_BYTES'])
+
+        with _file_lock(os.path.join(self.folder, '.evict.lock')):
+            entries = []
+            for entry in os.scandir(self.folder):
+                # Lock files are dot files.
+                if entry.is_file() and not entry.name.startswith('.') and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            size = sum(entry[1] for entry in entries)
+            for _, entry_size, entry_path in sorted(entries):
+                if size <= max_bytes:
+                    break
+                if entry_path == keep:
+                    continue
+                try:
+                    os.remove(entry_path)
+                    size -= entry_size
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        state = current_app.extensions['object_cache']
+        return {
+            'hits': state['hits'],
+            'misses': state['misses'],
+        }
+
+    def _touch(self, path):
+        # The modification time doubles as the last access time for eviction.
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _count(self, counter):
+        state = current_app.extensions['object_cache']
+        with state['lock']:
+            state[counter] += 1
+
+@contextmanager
+def _file_lock(path):
+    with open(path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class CachedReader:
+    """A parsed PdfReader plus the lock callers must hold while using it (readers aren't thread-safe)."""
+
+    def __init__(self, reader, version, size):
+        self.reader = reader
+        self.version = version
+        self.size = size
+        self.lock = threading.Lock()
+
+class ReaderCache:
+    """
+    Keeps parsed PdfReader instances per document so consecutive page reads
+    skip re-parsing the xref table and page tree. Entries are keyed by
+    document id and checked against a version (the file's mtime and size
+    for local files, the object name for stored objects). The LRU is
+    bounded by an estimate of the memory each reader holds;
+    READER_CACHE_MAX_BYTES set to 0 disables the cache.
+    """
+
+    # Parsed objects take roughly as much memory as the raw bytes pypdf keeps.
+    MEMORY_FACTOR = 2
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('READER_CACHE_MAX_BYTES', 128 * 1024 * 1024)
+
+        app.extensions['reader_cache'] = {
+            'entries': OrderedDict(),
+            'size': 0,
+            'hits': 0,
+            'misses': 0,
+            'lock': threading.Lock(),
+        }
+
+    def get(self, document, load_source, open_reader):
+        """
+        Return the CachedReader for a document, calling load_source() and
+        open_reader(source) to build it when missing or outdated.
+        """
+        state = current_app.extensions['reader_cache']
+        max_bytes = int(current_app.config['READER_CACHE_MAX_BYTES'])
+        version = self._version(document)
+        if version is None:
+            return CachedReader(open_reader(load_source()), None, 0)
+
+        with state['lock']:
+            entry = state['entries'].get(document.id)
+            if entry is not None and entry.version == version:
+                state['entries'].move_to_end(document.id)
+                state['hits'] += 1
+                return entry
+            state['misses'] += 1
+
+        source = load_source()
+        entry = CachedReader(open_reader(source), version, self._estimate_size(source))
+
+        if entry.size > max_bytes:
+            return entry
+
+        with state['lock']:
+            previous = state['entries'].pop(document.id, None)
+            if previous is not None:
+                state['size'] -= previous.size
+
+            state['entries'][document.id] = entry
+            state['size'] += entry.size
+
+            while state['size'] > max_bytes:
+                _, evicted = state['entries'].popitem(last=False)
+                state['size'] -= evicted.size
+
+        return entry
+
+    def invalidate(self, document_id):
+        state = current_app.extensions['reader_cache']
+        with state['lock']:
+            entry = state['entries'].pop(document_id, None)
+            if entry is not None:
+                state['size'] -= entry.size
+
+    def stats(self):
+        state = current_app.extensions['reader_cache']
+        return {
+            'hits': state['hits'],
+            'misses': state['misses'],
+            'entries': len(state['entries']),
+            'bytes': state['size'],
+        }
+
+    def _version(self, document):
+        if current_app.config['STORAGE_TYPE'] == 'minio':
+            return document.unique_name
+
+        try:
+            stat = os.stat(document.path)
+        except OSError:
+            return None
+        return (document.path, stat.st_mtime_ns, stat.st_size)
+
+    def _estimate_size(self, source):
+        if isinstance(source, bytes):
+            size = len(source)
+        elif isinstance(source, str):
+            size = os.path.getsize(source)
+        else:
+            size = source.seek(0, os.SEEK_END)
+        return size * self.MEMORY_FACTOR
@@ -1,16 +1,47 @@
-from flask import Blueprint, request, current_app, jsonify, make_response
-from sqlalchemy import select
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from flask import Blueprint, Response, request, current_app, jsonify, make_response, redirect, send_file, url_for
+from botocore.exceptions import ClientError
+from sqlalchemy import delete, select, tuple_, update
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
+import base64
+import hashlib
+import io
+import json
+import mimetypes
 import os
+import sys
+import tarfile
 import uuid
+import zipfile
 
-from app.components.pdf_toolset import sanitize_pdf
-from app.components.storage import upload_file_to_minio
+from app.components.extraction import read_pdf_metadata
+from app.components.pdf_toolset import sanitize_pdf, extract_all_pages
+from app.components.storage import (
+    delete_objects_from_minio,
+    open_object_from_minio,
+    presign_object_from_minio,
+    upload_file_to_minio,
+    upload_fileobj_to_minio,
+)
 from app.logger import logger
-from app.extensions import db
-from app.models import Document
+from app.extensions import db, object_cache, reader_cache, text_cache
+from app.http_cache import conditional_response, document_etag, document_last_modified, set_cache_control
+from app.jobs import job_queue
+from app.models import Document, DocumentPage, DocumentPageSize, Job
+from app.search import search_index, unindex_documents
 
 MAX_FILE_SIZE = 4 * 1024 * 1024  # 4MB
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_PAGE_SIZE = 1000
+DEFAULT_SEARCH_LIMIT = 20
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_BATCH_MAX_FILES = 1000
+DEFAULT_BATCH_WORKERS = 4
+DEFAULT_BULK_MAX_IDS = 1000
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+PATCHABLE_FIELDS = ('name', 'unique_name')
 
 documents = Blueprint('upload', __name__)
 
@@ -20,7 +51,130 @@ def allowed_file(filename):
 def maybe_upload_file(filepath, unique_filename):
     if (current_app.config['STORAGE_TYPE'] == 'minio'):
         upload_file_to_minio(filepath, current_app.config['STORAGE_DOCUMENTS_BUCKET'], unique_filename)
-        logger.info(f'File {unique_filename} uploaded')
+        logger.info('File %s uploaded', unique_filename)
+
+def maybe_extract_pages(document_record, filepath):
+    """Extract every page once at upload so reads never have to parse the PDF."""
+    pages = extract_all_pages(filepath)
+    document_record.page_count = len(pages)
+    document_record.text_stored = True
+    document_record.pages = [
+        DocumentPage(page_number=number, text=text)
+        for number, text in enumerate(pages, start=1)
+    ]
+    logger.info('Extracted %d pages from %s', len(pages), document_record.unique_name)
+
+def store_metadata(document_record, source, size_bytes):
+    """
+    Record the stored file's size and PDF metadata, so reads can validate
+    pages and report the page count without fetching the file. A file
+    pypdf can't read keeps its size and leaves the rest empty.
+    """
+    document_record.size_bytes = size_bytes
+    try:
+        metadata = read_pdf_metadata(source)
+    except Exception as e:
+        logger.warning('Could not read PDF metadata', {
+            'error': str(e),
+            'name': document_record.unique_name
+        })
+        return
+
+    document_record.pdf_version = metadata['pdf_version']
+    document_record.producer = metadata['producer']
+    document_record.encrypted = metadata['encrypted']
+    document_record.page_count = metadata['page_count']
+    document_record.page_sizes = [
+        DocumentPageSize(first_page=first_page, last_page=last_page, width=width, height=height)
+        for first_page, last_page, width, height in metadata['page_sizes']
+    ]
+
+def process_file(document_record, filepath, cleaned_filepath):
+    """Sanitize (or move) a saved upload, push it to storage, read its metadata and optionally extract its pages."""
+    if current_app.config['PDF_SANITIZE']:
+        sanitize_pdf(input=filepath, output=cleaned_filepath)
+    else:
+        os.rename(filepath, cleaned_filepath)
+    maybe_upload_file(cleaned_filepath, document_record.unique_name)
+    store_metadata(document_record, cleaned_filepath, os.path.getsize(cleaned_filepath))
+
+    if current_app.config.get('PDF_EAGER_EXTRACTION', False):
+        maybe_extract_pages(document_record, cleaned_filepath)
+
+def save_file(file, filepath):
+    """Save an upload while hashing it, so the content is only read once. Returns the SHA-256 hex digest."""
+    return save_stream(file.stream, filepath)
+
+def save_stream(stream, filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as f:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+def hash_stream(stream):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+def deduplicate_enabled():
+    return current_app.config.get('UPLOAD_DEDUPLICATE', False)
+
+def content_addressed_name(content_hash, filename):
+    return f"{content_hash}.{filename.rsplit('.', 1)[1].lower()}"
+
+def find_duplicate(content_hash):
+    """Return a processed document with the same content, if deduplication is enabled."""
+    if not deduplicate_enabled():
+        return None
+    return db.session.execute(
+        select(Document)
+        .where(Document.content_hash == content_hash, Document.status == 'ready')
+        .order_by(Document.id)
+        .limit(1)
+    ).scalar()
+
+def find_duplicates(content_hashes):
+    """Like find_duplicate, for many hashes in one query. Returns {content_hash: document}."""
+    if not deduplicate_enabled() or not content_hashes:
+        return {}
+    documents = db.session.execute(
+        select(Document)
+        .where(Document.content_hash.in_(content_hashes), Document.status == 'ready')
+        .order_by(Document.id.desc())
+    ).scalars()
+    # Descending, so the oldest document of each hash is the one kept.
+    return {document.content_hash: document for document in documents}
+
+def reuse_document(document_record, existing):
+    """Point a document at the stored (and sanitized) object and the extracted pages of an identical upload."""
+    document_record.unique_name = existing.unique_name
+    document_record.path = existing.path
+    document_record.page_count = existing.page_count
+    document_record.size_bytes = existing.size_bytes
+    document_record.pdf_version = existing.pdf_version
+    document_record.producer = existing.producer
+    document_record.encrypted = existing.encrypted
+    document_record.text_stored = existing.text_stored
+    document_record.pages = [
+        DocumentPage(page_number=page.page_number, text=page.text) for page in existing.pages
+    ]
+    document_record.page_sizes = [
+        DocumentPageSize(first_page=size.first_page, last_page=size.last_page, width=size.width, height=size.height)
+        for size in existing.page_sizes
+    ]
+    logger.info('Document %s is a duplicate of document %s', document_record.name, existing.id)
+
+def remove_local_files(filepath, cleaned_filepath, error):
+    if (current_app.config['STORAGE_TYPE'] != 'local') or error:
+        if os.path.exists(cleaned_filepath):
+            os.remove(cleaned_filepath)
+
+    if os.path.exists(filepath):
+        os.remove(filepath)
 
 def file_allowed_size(file):
     file.seek(0, os.SEEK_END)  # Move cursor to the end of the file
@@ -66,31 +220,106 @@ def upload_file():
     filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename)
     cleaned_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f"cleaned-{unique_filename}")
 
+    if current_app.config['UPLOAD_ASYNC']:
+        return queue_upload(file, filename, unique_filename, filepath, cleaned_filepath)
+
+    if can_stream_upload():
+        return stream_upload(file, filename, unique_filename, cleaned_filepath)
+
     try:
-        file.save(filepath)
+        content_hash = save_file(file, filepath)
 
         if not os.path.exists(filepath):
             logger.info("File save failed!")
             return "File save failed", 500
 
-        if current_app.config['PDF_SANITIZE']:
-            sanitize_pdf(input=filepath, output=cleaned_filepath)
+        duplicate = find_duplicate(content_hash)
+        if duplicate is not None:
+            document_record = Document(name=filename, content_hash=content_hash)
+            reuse_document(document_record, duplicate)
         else:
-            os.rename(filepath, cleaned_filepath)
-        maybe_upload_file(cleaned_filepath, unique_filename)
+            if deduplicate_enabled():
+                unique_filename = content_addressed_name(content_hash, filename)
+                cleaned_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f"cleaned-{unique_filename}")
+
+            document_record = Document(
+                name=filename,
+                unique_name=unique_filename,
+                path=cleaned_filepath,
+                content_hash=content_hash
+            )
+            process_file(document_record, filepath, cleaned_filepath)
+
+        db.session.add(document_record)
+        db.session.commit()
+        logger.info('Document %s persisted', filename)
+    except Exception as e:
+        error = True
+        db.session.rollback()
+        logger.error('Error saving document', {
+            'error': str(e)
+        })
+        return make_response(jsonify({
+            'status': 'error',
+            'result': 'Internal Server Error',
+            'error': str(e)
+        }), 500)
+    finally:
+        remove_local_files(filepath, cleaned_filepath, error)
+
+    return make_response(jsonify(document_record.to_dict()), 200)
+
+def can_stream_upload():
+    return (current_app.config['STORAGE_TYPE'] == 'minio'
+            and current_app.config.get('STORAGE_STREAMING_UPLOAD', False))
+
+def stream_upload(file, filename, unique_filename, cleaned_filepath):
+    """Send the upload (or its sanitized copy, kept in memory) to the bucket without touching UPLOAD_FOLDER."""
+    try:
+        content_hash = hash_stream(file.stream)
+        duplicate = find_duplicate(content_hash)
+        if duplicate is not None:
+            document_record = Document(name=filename, content_hash=content_hash)
+            reuse_document(document_record, duplicate)
+            db.session.add(document_record)
+            db.session.commit()
+            return make_response(jsonify(document_record.to_dict()), 200)
+
+        if deduplicate_enabled():
+            unique_filename = content_addressed_name(content_hash, filename)
+
+        stream = file.stream
+        if current_app.config['PDF_SANITIZE']:
+            stream = io.BytesIO()
+            sanitize_pdf(input=file.stream, output=stream)
+            stream.seek(0)
 
         document_record = Document(
             name=filename,
             unique_name=unique_filename,
-            path=cleaned_filepath
+            path=cleaned_filepath,
+            content_hash=content_hash
         )
+
+        # Read everything before uploading: the transfer closes the stream when it is done.
+        size_bytes = stream.seek(0, os.SEEK_END)
+        stream.seek(0)
+        store_metadata(document_record, stream, size_bytes)
+
+        if current_app.config.get('PDF_EAGER_EXTRACTION', False):
+            stream.seek(0)
+            maybe_extract_pages(document_record, stream)
+
+        stream.seek(0)
+        upload_fileobj_to_minio(stream, current_app.config['STORAGE_DOCUMENTS_BUCKET'], unique_filename)
+        logger.info('File %s uploaded', unique_filename)
+
         db.session.add(document_record)
         db.session.commit()
-        logger.info(f'Document {filename} persisted')
+        logger.info('Document %s persisted', filename)
     except Exception as e:
-        error = True
         db.session.rollback()
-        logger.error(f'Error saving document: {str(e)}', {
+        logger.error('Error saving document', {
             'error': str(e)
         })
         return make_response(jsonify({
@@ -98,22 +327,394 @@ def upload_file():
             'result': 'Internal Server Error',
             'error': str(e)
         }), 500)
+
+    return make_response(jsonify(document_record.to_dict()), 200)
+
+def iter_batch_files():
+    """
+    Yield (name, stream, too_large) for every file of a batch: each `files`
+    part, then the members of the `archive` part. Zip archives are read
+    member by member; anything else is opened as a tar stream (optionally
+    compressed) and unpacked as it is read.
+    """
+    for file in request.files.getlist('files'):
+        yield file.filename, file.stream, not file_allowed_size(file)
+
+    archive = request.files.get('archive')
+    if archive is None:
+        return
+
+    if zipfile.is_zipfile(archive.stream):
+        with zipfile.ZipFile(archive.stream) as zip_file:
+            for info in zip_file.infolist():
+                if info.is_dir():
+                    continue
+                with zip_file.open(info) as member:
+                    yield info.filename, member, info.file_size > MAX_FILE_SIZE
+    else:
+        archive.stream.seek(0)
+        with tarfile.open(fileobj=archive.stream, mode='r|*') as tar_file:
+            for member in tar_file:
+                if not member.isfile():
+                    continue
+                yield member.name, tar_file.extractfile(member), member.size > MAX_FILE_SIZE
+
+def receive_batch_file(name, stream, too_large):
+    """Validate one file of a batch and save it to UPLOAD_FOLDER. Returns its batch item."""
+    filename = secure_filename(os.path.basename(name))
+    item = {'name': name}
+
+    if not filename or not allowed_file(filename):
+        item['error'] = 'File not allowed'
+    elif too_large:
+        item['error'] = 'File exceeds size limit of 4MB'
+    else:
+        unique_filename = f"{uuid.uuid4()}_{filename}"
+        item.update({
+            'filename': filename,
+            'unique_name': unique_filename,
+            'filepath': os.path.join(current_app.config['UPLOAD_FOLDER'], unique_filename),
+            'cleaned_filepath': os.path.join(current_app.config['UPLOAD_FOLDER'], f"cleaned-{unique_filename}"),
+        })
+        item['content_hash'] = save_stream(stream, item['filepath'])
+
+    return item
+
+def process_batch_item(app, item):
+    with app.app_context():
+        process_file(item['record'], item['filepath'], item['cleaned_filepath'])
+
+def process_batch(items):
+    """
+    Build the document of every saved batch item. Duplicates reuse an
+    existing document, or the first identical file of the batch; the
+    others are sanitized, uploaded and extracted concurrently by
+    BATCH_UPLOAD_WORKERS threads. Failures are recorded in item['error'].
+    """
+    existing = find_duplicates({item['content_hash'] for item in items})
+    first_by_hash = {}
+    to_process = []
+
+    for item in items:
+        content_hash = item['content_hash']
+        item['record'] = Document(name=item['filename'], content_hash=content_hash)
+
+        if content_hash in existing:
+            reuse_document(item['record'], existing[content_hash])
+        elif deduplicate_enabled() and content_hash in first_by_hash:
+            item['duplicate_of'] = first_by_hash[content_hash]
+        else:
+            first_by_hash[content_hash] = item
+            if deduplicate_enabled():
+                item['unique_name'] = content_addressed_name(content_hash, item['filename'])
+                item['cleaned_filepath'] = os.path.join(current_app.config['UPLOAD_FOLDER'], f"cleaned-{item['unique_name']}")
+            item['record'].unique_name = item['unique_name']
+            item['record'].path = item['cleaned_filepath']
+            to_process.append(item)
+
+    if to_process:
+        app = current_app._get_current_object()
+        workers = current_app.config.get('BATCH_UPLOAD_WORKERS', DEFAULT_BATCH_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as executor:
+            futures = {executor.submit(process_batch_item, app, item): item for item in to_process}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    futures[future]['error'] = str(e)
+                    logger.error('Error processing batch file', {
+                        'error': str(e),
+                        'name': futures[future]['name']
+                    })
+
+    for item in items:
+        source = item.pop('duplicate_of', None)
+        if source is None:
+            continue
+        if 'error' in source:
+            item['error'] = source['error']
+        else:
+            reuse_document(item['record'], source['record'])
+
+def batch_result(item):
+    if 'error' in item:
+        return {'name': item['name'], 'status': 'error', 'result': item['error']}
+    return {'name': item['name'], 'status': 'ready', 'document': item['document']}
+
+@documents.route('/batch', methods=['POST'])
+def upload_batch():
+    if 'files' not in request.files and 'archive' not in request.files:
+        return make_response(jsonify({
+            'status': 'error',
+            'result': 'No files or archive part'
+        }), 422)
+
+    max_files = current_app.config.get('BATCH_MAX_FILES', DEFAULT_BATCH_MAX_FILES)
+    items = []
+
+    try:
+        try:
+            for name, stream, too_large in iter_batch_files():
+                if len(items) == max_files:
+                    return make_response(jsonify({
+                        'status': 'error',
+                        'result': f'Batch exceeds the limit of {max_files} files'
+                    }), 422)
+                items.append(receive_batch_file(name, stream, too_large))
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            return make_response(jsonify({
+                'status': 'error',
+                'result': f'Invalid archive: {str(e)}'
+            }), 422)
+
+        accepted = [item for item in items if 'error' not in item]
+        try:
+            process_batch(accepted)
+
+            # One flush, so the rows go out as multi-row INSERTs rather than a commit per file.
+            created = [item for item in accepted if 'error' not in item]
+            db.session.add_all(item['record'] for item in created)
+            db.session.flush()
+            for item in created:
+                item['document'] = item['record'].to_dict()
+            db.session.commit()
+            logger.info('Batch of %d files persisted (%d failed)', len(created), len(items) - len(created))
+        except Exception as e:
+            for item in accepted:
+                item['error'] = True
+            db.session.rollback()
+            logger.error('Error saving batch', {
+                'error': str(e)
+            })
+            return make_response(jsonify({
+                'status': 'error',
+                'result': 'Internal Server Error',
+                'error': str(e)
+            }), 500)
     finally:
-        if (current_app.config['STORAGE_TYPE'] != 'local') or error:
-            if os.path.exists(cleaned_filepath):
-                os.remove(cleaned_filepath)
+        for item in items:
+            if 'filepath' in item:
+                remove_local_files(item['filepath'], item['cleaned_filepath'], 'error' in item)
 
+    return make_response(jsonify({
+        'results': [batch_result(item) for item in items]
+    }), 200)
+
+def queue_upload(file, filename, unique_filename, filepath, cleaned_filepath):
+    """Persist the raw upload and a pending document, leaving the rest of the work to a job."""
+    try:
+        content_hash = save_file(file, filepath)
+
+        duplicate = find_duplicate(content_hash)
+        if duplicate is not None:
+            # Nothing left to process: answer like a synchronous upload.
+            os.remove(filepath)
+            document_record = Document(name=filename, content_hash=content_hash)
+            reuse_document(document_record, duplicate)
+            db.session.add(document_record)
+            db.session.commit()
+            return make_response(jsonify(document_record.to_dict()), 200)
+
+        document_record = Document(
+            name=filename,
+            unique_name=unique_filename,
+            path=cleaned_filepath,
+            content_hash=content_hash,
+            status='pending'
+        )
+        db.session.add(document_record)
+        db.session.commit()
+
+        job = job_queue.enqueue('process_upload', document_record.id)
+    except Exception as e:
+        db.session.rollback()
         if os.path.exists(filepath):
             os.remove(filepath)
+        logger.error('Error queueing document', {
+            'error': str(e)
+        })
+        return make_response(jsonify({
+            'status': 'error',
+            'result': 'Internal Server Error',
+            'error': str(e)
+        }), 500)
 
-    return make_response(jsonify(document_record.to_dict()), 200)
+    return make_response(jsonify({
+        'status': 'pending',
+        'job_id': job.id,
+        'document': document_record.to_dict()
+    }), 202)
+
+@job_queue.handler('process_upload')
+def process_upload_job(job):
+    document_record = db.session.get(Document, job.document_id)
+    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], document_record.unique_name)
+    cleaned_filepath = document_record.path
+    error = False
+
+    try:
+        # An identical upload may have been processed since this one was queued.
+        duplicate = find_duplicate(document_record.content_hash) if document_record.content_hash else None
+        if duplicate is not None:
+            reuse_document(document_record, duplicate)
+        else:
+            if document_record.content_hash and deduplicate_enabled():
+                document_record.unique_name = content_addressed_name(document_record.content_hash, document_record.name)
+                cleaned_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f"cleaned-{document_record.unique_name}")
+                document_record.path = cleaned_filepath
+            process_file(document_record, filepath, cleaned_filepath)
+        document_record.status = 'ready'
+        db.session.commit()
+        logger.info('Document %s persisted', document_record.name)
+    except Exception:
+        error = True
+        db.session.rollback()
+        document_record.status = 'failed'
+        db.session.commit()
+        raise
+    finally:
+        remove_local_files(filepath, cleaned_filepath, error)
+
+@documents.route('/<int:id>/status', methods=['GET'])
+def get_document_status(id: int):
+    try:
+        document = db.session.get(Document, id)
+        if document is None:
+            return make_response(jsonify({
+                'status': 'error',
+                'result': f'No document found with id {id}'
+            }), 404)
+
+        job = db.session.execute(
+            select(Job).where(Job.document_id == id).order_by(Job.id.desc()).limit(1)
+        ).scalar()
+        status = {
+            'id': document.id,
+            'status': document.status,
+            'job': job.to_dict() if job else None
+        }
+    except Exception as e:
+        logger.error('Error getting document status', {
+            'error': str(e),
+            'id': id
+        })
+        return make_response(jsonify({
+            'status': 'error',
+            'result': 'Internal Server Error',
+            'error': str(e)
+        }), 500)
+
+    return make_response(jsonify(status), 200)
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, order):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if order == 'id':
+            (last_id,) = values
+            return [int(last_id)]
+        last_created_at, last_id = values
+        return [datetime.fromisoformat(last_created_at), int(last_id)]
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def parse_datetime_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name}: expected an ISO 8601 date')
+
+def name_prefix_filter(prefix):
+    """
+    Match names starting with `prefix` as a range, name >= prefix and name
+    < the next prefix, which ix_documents_name can serve (LIKE can't,
+    without a pattern_ops index). startswith stays as an exact recheck.
+    """
+    conditions = [Document.name >= prefix]
+    # The first string after every name with the prefix: bump its last character
+    # (dropping trailing ones that can't be bumped).
+    upper = prefix.rstrip(chr(sys.maxunicode))
+    if upper:
+        conditions.append(Document.name < upper[:-1] + chr(ord(upper[-1]) + 1))
+    conditions.append(Document.name.startswith(prefix, autoescape=True))
+    return conditions
+
+def build_list_query():
+    """
+    Build the listing statement from the query string: keyset pagination
+    (`cursor`, `limit`, `order` of id or created_at), projection (`fields`)
+    and filters (`name_prefix`, `created_after`, `created_before`).
+    Returns (statement, fields, order, limit).
+    """
+    default_limit = current_app.config.get('DOCUMENTS_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    max_limit = current_app.config.get('DOCUMENTS_MAX_PAGE_SIZE', DEFAULT_MAX_PAGE_SIZE)
+
+    try:
+        limit = int(request.args.get('limit', default_limit))
+    except ValueError:
+        raise ValueError('Invalid limit')
+    if limit < 1 or limit > max_limit:
+        raise ValueError(f'limit must be between 1 and {max_limit}')
+
+    order = request.args.get('order', 'id')
+    if order not in ('id', 'created_at'):
+        raise ValueError('order must be id or created_at')
+
+    columns = Document.__table__.columns.keys()
+    fields = columns
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    # The cursor columns are always selected, even when not requested.
+    selected = list(dict.fromkeys(list(fields) + ['id', order]))
+    stmt = select(*[getattr(Document, field) for field in selected])
+
+    if request.args.get('name_prefix'):
+        stmt = stmt.where(*name_prefix_filter(request.args['name_prefix']))
+
+    created_after = parse_datetime_arg('created_after')
+    if created_after is not None:
+        stmt = stmt.where(Document.created_at >= created_after)
+    created_before = parse_datetime_arg('created_before')
+    if created_before is not None:
+        stmt = stmt.where(Document.created_at < created_before)
+
+    cursor = request.args.get('cursor')
+    if order == 'id':
+        if cursor:
+            (last_id,) = decode_cursor(cursor, order)
+            stmt = stmt.where(Document.id > last_id)
+        stmt = stmt.order_by(Document.id)
+    else:
+        if cursor:
+            last_created_at, last_id = decode_cursor(cursor, order)
+            stmt = stmt.where(tuple_(Document.created_at, Document.id) > (last_created_at, last_id))
+        stmt = stmt.order_by(Document.created_at, Document.id)
+
+    # One extra row tells whether there is a next page.
+    return stmt.limit(limit + 1), fields, order, limit
 
 @documents.route('/', methods=['GET'])
 def list_documents():
     try:
-        stmt = select(Document)
-        results = db.session.execute(stmt).scalars().all()
-        documents = [doc.to_dict() for doc in results]
+        stmt, fields, order, limit = build_list_query()
+    except ValueError as e:
+        return make_response(jsonify({
+            'status': 'error',
+            'result': str(e)
+        }), 422)
+
+    try:
+        rows = db.session.execute(stmt).all()
+        documents = [{field: row._mapping[field] for field in fields} for row in rows[:limit]]
     except Exception as e:
         logger.error('Error listing documents', {
             'error': str(e),
@@ -124,7 +725,52 @@ def list_documents():
             'error': str(e)
         }), 500)
 
-    return (make_response(jsonify(documents), 200))
+    response = make_response(jsonify(documents), 200)
+
+    if len(rows) > limit:
+        last = rows[limit - 1]._mapping
+        cursor = encode_cursor([last['id']] if order == 'id' else [last['created_at'].isoformat(), last['id']])
+        next_args = {**request.args.to_dict(), 'cursor': cursor}
+        response.headers['X-Next-Cursor'] = cursor
+        response.headers['Link'] = f'<{url_for(".list_documents", **next_args)}>; rel="next"'
+
+    return response
+
+@documents.route('/search', methods=['GET'])
+def search_documents():
+    query = request.args.get('q', '').strip()
+    max_limit = current_app.config['SEARCH_MAX_RESULTS']
+
+    try:
+        limit = int(request.args.get('limit', min(DEFAULT_SEARCH_LIMIT, max_limit)))
+        if limit < 1 or limit > max_limit:
+            raise ValueError
+    except ValueError:
+        return make_response(jsonify({
+            'status': 'error',
+            'result': f'limit must be between 1 and {max_limit}'
+        }), 422)
+
+    if not query:
+        return make_response(jsonify({
+            'status': 'error',
+            'result': 'Missing search query q'
+        }), 422)
+
+    try:
+        results = search_index.search(query, limit)
+    except Exception as e:
+        logger.error('Error searching documents', {
+            'error': str(e),
+            'query': query
+        })
+        return make_response(jsonify({
+            'status': 'error',
+            'result': 'Internal Server Error',
+            'error': str(e)
+        }), 500)
+
+    return make_response(jsonify({'query': query, 'results': results}), 200)
 
 @documents.route('/<int:id>', methods=['GET'])
 def get_document_by_id(id: int):
@@ -137,6 +783,7 @@ def get_document_by_id(id: int):
             }), 404)
 
         document_dict = document.to_dict()
+        document_dict['page_sizes'] = [size.to_dict() for size in document.page_sizes]
     except Exception as e:
         logger.error('Error getting document by id', {
             'error': str(e),
@@ -148,7 +795,143 @@ def get_document_by_id(id: int):
             'error': str(e)
         }), 500)
 
-    return make_response(jsonify(document_dict), 200)
+    return conditional_response(
+        document_etag(document),
+        document_last_modified(document),
+        'CACHE_CONTROL_DOCUMENT',
+        lambda: make_response(jsonify(document_dict), 200)
+    )
+
+def local_file_path(document):
+    """
+    The real path of a document's local file, or None when it resolves
+    outside UPLOAD_FOLDER. `path` can be changed through PATCH, so it is
+    never trusted to point at a stored file.
+    """
+    upload_folder = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+    path = os.path.realpath(document.path)
+    if os.path.commonpath([upload_folder, path]) != upload_folder:
+        return None
+    return path
+
+def content_disposition(document):
+    disposition = 'attachment' if request.args.get('download') else 'inline'
+    return f"{disposition}; filename=\"{secure_filename(document.name) or 'document'}\""
+
+def send_local_file(document, etag, last_modified):
+    """
+    send_file hands the open file to the server's wsgi.file_wrapper
+    (sendfile under gunicorn, X-Sendfile with USE_X_SENDFILE) and answers
+    conditional and Range requests itself.
+    """
+    path = local_file_path(document)
+    if path is None or not os.path.exists(path):
+        return make_response(jsonify({
+            'status': 'error',
+            'result': f'Stored file of document {document.id} not found'
+        }), 404)
+
+    response = send_file(
+        path,
+        mimetype=mimetypes.guess_type(document.name)[0] or 'application/octet-stream',
+        conditional=True,
+        etag=etag,
+        last_modified=last_modified
+    )
+    response.headers['Content-Disposition'] = content_disposition(document)
+    return set_cache_control(response, 'CACHE_CONTROL_FILE')
+
+def stream_stored_object(document, etag):
+    """Relay the object (or the requested range of it) chunk by chunk, never holding more than one chunk."""
+    byte_range = request.headers.get('Range')
+    # A stale If-Range asks for the whole, current representation.
+    if byte_range and request.if_range.etag and request.if_range.etag != etag:
+        byte_range = None
+
+    try:
+        stored_object = open_object_from_minio(
+            current_app.config['STORAGE_DOCUMENTS_BUCKET'], document.unique_name, byte_range
+        )
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        if code == 'InvalidRange':
+            return make_response(jsonify({
+                'status': 'error',
+                'result': 'Requested range not satisfiable'
+            }), 416)
+        if code in ('NoSuchKey', '404'):
+            return make_response(jsonify({
+                'status': 'error',
+                'result': f'Stored file of document {document.id} not found'
+            }), 404)
+        raise
+
+    def generate():
+        try:
+            yield from stored_object['Body'].iter_chunks(DOWNLOAD_CHUNK_SIZE)
+        finally:
+            stored_object['Body'].close()
+
+    response = Response(generate(), mimetype=mimetypes.guess_type(document.name)[0] or 'application/octet-stream')
+    response.headers['Content-Length'] = stored_object['ContentLength']
+    response.headers['Content-Disposition'] = content_disposition(document)
+    response.headers['Accept-Ranges'] = 'bytes'
+    if 'ContentRange' in stored_object:
+        response.status_code = 206
+        response.headers['Content-Range'] = stored_object['ContentRange']
+    return response
+
+@documents.route('/<int:id>/file', methods=['GET'])
+def download_document_file(id: int):
+    try:
+        document = db.session.get(Document, id)
+        if document is None:
+            return make_response(jsonify({
+                'status': 'error',
+                'result': f'No document found with id {id}'
+            }), 404)
+
+        if document.status != 'ready':
+            return make_response(jsonify({
+                'status': 'error',
+                'result': f'Document with id {id} is {document.status}'
+            }), 409)
+
+        etag = document_etag(document, 'file')
+        last_modified = document_last_modified(document)
+
+        if current_app.config['STORAGE_TYPE'] != 'minio':
+            return send_local_file(document, etag, last_modified)
+
+        if current_app.config.get('STORAGE_DOWNLOAD_REDIRECT', False):
+            url = presign_object_from_minio(
+                current_app.config['STORAGE_DOCUMENTS_BUCKET'],
+                document.unique_name,
+                current_app.config.get('STORAGE_PRESIGNED_URL_EXPIRES', 300),
+                content_type=mimetypes.guess_type(document.name)[0],
+                content_disposition=content_disposition(document)
+            )
+            response = redirect(url, 302)
+            # The URL expires, so the redirect itself must not be reused.
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+
+        return conditional_response(
+            etag, last_modified, 'CACHE_CONTROL_FILE', lambda: stream_stored_object(document, etag), weak=False
+        )
+    except HTTPException:
+        # e.g. the 416 of send_file for an unsatisfiable range.
+        raise
+    except Exception as e:
+        logger.error('Error downloading document', {
+            'error': str(e),
+            'id': id
+        })
+        return make_response(jsonify({
+            'status': 'error',
+            'result': 'Internal Server Error',
+            'error': str(e)
+        }), 500)
 
 @documents.route('/<int:id>', methods=['PATCH'])
 def patch_document_by_id(id: int):
@@ -161,6 +944,7 @@ def patch_document_by_id(id: int):
             }), 404)
 
         data = request.json
+        previous_unique_name = document.unique_name
         if 'name' in data:
             document.name = data['name']
         if 'unique_name' in data:
@@ -169,8 +953,14 @@ def patch_document_by_id(id: int):
             document.path = data['path']
 
         db.session.commit()
+
+        # The stored object changed, so previously extracted text no longer applies.
+        if 'unique_name' in data or 'path' in data:
+            text_cache.invalidate(id)
+            reader_cache.invalidate(id)
+            object_cache.invalidate(previous_unique_name)
     except Exception as e:
-        logger.error(f'Error patching document: {str(e)}', {
+        logger.error('Error patching document', {
             'error': str(e),
             'id': id
         })
@@ -194,9 +984,9 @@ def delete_document_by_id(id: int):
 
         db.session.delete(document)
         db.session.commit()
+        forget_documents([document])
     except Exception as e:
-        print(str(e))
-        logger.error('Error getting document by id', {
+        logger.error('Error deleting document', {
             'error': str(e),
             'id': id
         })
@@ -206,4 +996,184 @@ def delete_document_by_id(id: int):
             'error': str(e)
         }), 500)
 
-    return make_response('', 204)
\ No newline at end of file
+    return make_response('', 204)
+
+def forget_documents(deleted):
+    """
+    Drop the cached data of deleted documents (anything with id, unique_name
+    and path) and remove their stored files: MinIO objects in batched
+    DeleteObjects calls, or local files. With UPLOAD_DEDUPLICATE several
+    documents can share a file, so files still referenced are kept.
+    """
+    for document in deleted:
+        text_cache.invalidate(document.id)
+        reader_cache.invalidate(document.id)
+        object_cache.invalidate(document.unique_name)
+
+    try:
+        names = {document.unique_name for document in deleted}
+        still_used = set(db.session.execute(
+            select(Document.unique_name).where(Document.unique_name.in_(names))
+        ).scalars())
+        orphaned = {document.unique_name: document for document in deleted if document.unique_name not in still_used}
+        if not orphaned:
+            return
+
+        if current_app.config['STORAGE_TYPE'] == 'minio':
+            failed = delete_objects_from_minio(current_app.config['STORAGE_DOCUMENTS_BUCKET'], orphaned)
+            if failed:
+                logger.error('Error deleting stored objects', {'keys': failed})
+        else:
+            for document in orphaned.values():
+                path = local_file_path(document)
+                if path is None:
+                    logger.warning('Not deleting a file outside the upload folder', {'path': document.path})
+                elif os.path.exists(path):
+                    os.remove(path)
+    except Exception as e:
+        # The rows are already gone; a leftover file is only wasted space.
+        logger.error('Error deleting stored files', {
+            'error': str(e)
+        })
+
+def parse_bulk_ids(data):
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError('ids must be a non-empty list of integers')
+
+    max_ids = current_app.config.get('BULK_MAX_IDS', DEFAULT_BULK_MAX_IDS)
+    if len(ids) > max_ids:
+        raise ValueError(f'At most {max_ids} ids can be given')
+    return list(dict.fromkeys(ids))
+
+def parse_bulk_patch(data):
+    """Validate a bulk-patch body and return its changes as {id: {field: value}}."""
+    changes = data.get('documents') if isinstance(data, dict) else None
+    if not isinstance(changes, list) or not changes:
+        raise ValueError('documents must be a non-empty list')
+
+    max_ids = current_app.config.get('BULK_MAX_IDS', DEFAULT_BULK_MAX_IDS)
+    if len(changes) > max_ids:
+        raise ValueError(f'At most {max_ids} documents can be given')
+
+    parsed = {}
+    for change in changes:
+        if not isinstance(change, dict) or not isinstance(change.get('id'), int) or isinstance(change['id'], bool):
+            raise ValueError('Every document needs an integer id')
+        unknown = [field for field in change if field != 'id' and field not in PATCHABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        parsed.setdefault(change['id'], {}).update({field: value for field, value in change.items() if field != 'id'})
+    return parsed
+
+def get_documents_by_ids(ids):
+    documents = db.session.execute(select(Document).where(Document.id.in_(ids))).scalars()
+    by_id = {document.id: document for document in documents}
+    return [by_id[id].to_dict() for id in ids if id in by_id], [id for id in ids if id not in by_id]
+
+@documents.route('/bulk-get', methods=['POST'])
+def bulk_get_documents():
+    try:
+        ids = parse_bulk_ids(request.get_json(silent=True))
+    except ValueError as e:
+        return make_response(jsonify({
+            'status': 'error',
+            'result': str(e)
+        }), 422)
+
+    try:
+        found, missing = get_documents_by_ids(ids)
+    except Exception as e:
+        logger.error('Error getting documents', {
+            'error': str(e)
+        })
+        return make_response(jsonify({
+            'status': 'error',
+            'result': 'Internal Server Error',
+            'error': str(e)
+        }), 500)
+
+    return make_response(jsonify({'documents': found, 'missing': missing}), 200)
+
+@documents.route('/bulk-patch', methods=['POST'])
+def bulk_patch_documents():
+    try:
+        changes = parse_bulk_patch(request.get_json(silent=True))
+    except ValueError as e:
+        return make_response(jsonify({
+            'status': 'error',
+            'result': str(e)
+        }), 422)
+
+    try:
+        previous_unique_names = dict(db.session.execute(
+            select(Document.id, Document.unique_name).where(Document.id.in_(changes))
+        ).all())
+
+        rows = [{'id': id, **fields} for id, fields in changes.items() if id in previous_unique_names and fields]
+        if rows:
+            # A list of parameter sets keyed by primary key runs as one executemany UPDATE.
+            db.session.execute(update(Document), rows)
+        db.session.commit()
+
+        for row in rows:
+            if 'unique_name' in row or 'path' in row:
+                text_cache.invalidate(row['id'])
+                reader_cache.invalidate(row['id'])
+                object_cache.invalidate(previous_unique_names[row['id']])
+
+        found, missing = get_documents_by_ids(list(changes))
+    except Exception as e:
+        db.session.rollback()
+        logger.error('Error patching documents', {
+            'error': str(e)
+        })
+        return make_response(jsonify({
+            'status': 'error',
+            'result': 'Internal Server Error',
+            'error': str(e)
+        }), 500)
+
+    return make_response(jsonify({'documents': found, 'missing': missing}), 200)
+
+@documents.route('/bulk-delete', methods=['POST'])
+def bulk_delete_documents():
+    try:
+        ids = parse_bulk_ids(request.get_json(silent=True))
+    except ValueError as e:
+        return make_response(jsonify({
+            'status': 'error',
+            'result': str(e)
+        }), 422)
+
+    try:
+        deleted = db.session.execute(
+            select(Document.id, Document.unique_name, Document.path).where(Document.id.in_(ids))
+        ).all()
+        deleted_ids = {row.id for row in deleted}
+
+        if deleted_ids:
+            # Pages and jobs are removed explicitly: SQLite only honours ON DELETE CASCADE with foreign keys on.
+            unindex_documents(deleted_ids)
+            db.session.execute(delete(DocumentPage).where(DocumentPage.document_id.in_(deleted_ids)))
+            db.session.execute(delete(DocumentPageSize).where(DocumentPageSize.document_id.in_(deleted_ids)))
+            db.session.execute(delete(Job).where(Job.document_id.in_(deleted_ids)))
+            db.session.execute(delete(Document).where(Document.id.in_(deleted_ids)))
+        db.session.commit()
+
+        forget_documents(deleted)
+    except Exception as e:
+        db.session.rollback()
+        logger.error('Error deleting documents', {
+            'error': str(e)
+        })
+        return make_response(jsonify({
+            'status': 'error',
+            'result': 'Internal Server Error',
+            'error': str(e)
+        }), 500)
+
+    return make_response(jsonify({
+        'deleted': [id for id in ids if id in deleted_ids],
+        'missing': [id for id in ids if id not in deleted_ids]
+    }), 200)
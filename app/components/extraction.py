@@ -0,0 +1,326 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import io
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+
+from pypdf import PageObject, PdfReader
+from pypdf.errors import PdfReadError
+from pypdf.generic import IndirectObject, NameObject
+
+from app.logger import logger
+from app.metrics import PDF_PAGE_EXTRACT_DURATION, PDF_PARSE_DURATION, timed
+
+DEFAULT_MAX_PAGES_PER_REQUEST = 100
+DEFAULT_PARALLEL_MIN_PAGES = 4
+INHERITABLE_PAGE_ATTRIBUTES = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+# Runs whose baselines are closer than this fraction of their font size share a line.
+LINE_TOLERANCE = 0.5
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+def parse_page_ranges(value, number_of_pages):
+    """
+    Turn a `pages` query value such as "1-20,35" or "all" into a list of
+    1-based page numbers, in request order and without duplicates.
+    """
+    if value.strip().lower() == 'all':
+        return list(range(1, number_of_pages + 1))
+
+    pages = []
+    for part in value.split(','):
+        part = part.strip()
+        if '-' in part:
+            start, end = (int(bound) for bound in part.split('-', 1))
+            if start > end:
+                raise ValueError(f"range {part} is reversed")
+        else:
+            start = end = int(part)
+
+        if start < 1 or end > number_of_pages:
+            raise ValueError(f"{part} is out of range 1-{number_of_pages}")
+        pages.extend(range(start, end + 1))
+
+    return list(dict.fromkeys(pages))
+
+@timed(PDF_PARSE_DURATION)
+def open_reader(source):
+    """Open a PdfReader over a local path, a file object or the raw bytes of a stored object."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    if isinstance(source, (str, io.BytesIO)):
+        return PdfReader(source)
+
+    # Outside strict mode, pypdf checks every xref entry on open, which reads the
+    # whole file. Remote streams skip that check and only fall back to it for
+    # files whose xref table is broken.
+    try:
+        reader = PdfReader(source, strict=True)
+    except PdfReadError:
+        source.seek(0)
+        return PdfReader(source)
+
+    reader.strict = False
+    return reader
+
+def count_pages(reader):
+    """
+    Read the page count from the page tree root. Unlike len(reader.pages),
+    this doesn't load every page object, which matters when the PDF is
+    fetched in ranges.
+    """
+    if reader.flattened_pages is None:
+        try:
+            count = reader.trailer['/Root']['/Pages']['/Count']
+            if isinstance(count, int):
+                return count
+        except Exception:
+            pass
+    return len(reader.pages)
+
+def read_pdf_metadata(source):
+    """
+    Read what the API reports about a PDF without extracting any text:
+    page count, PDF version, producer, whether it is encrypted and the
+    page sizes, as runs of consecutive pages sharing a MediaBox:
+
+        {"page_count": 12, "pdf_version": "1.7", "producer": "LibreOffice",
+         "encrypted": False, "page_sizes": [(1, 12, 612.0, 792.0)]}
+
+    Files encrypted with a user password only report their version.
+    """
+    reader = open_reader(source)
+    metadata = {
+        'pdf_version': reader.pdf_header.removeprefix('%PDF-')[:10],
+        'encrypted': reader.is_encrypted,
+        'page_count': None,
+        'producer': None,
+        'page_sizes': [],
+    }
+
+    if reader.is_encrypted and not reader.decrypt(''):
+        return metadata
+
+    metadata['page_count'] = len(reader.pages)
+    if reader.metadata is not None and reader.metadata.producer:
+        metadata['producer'] = str(reader.metadata.producer)[:255]
+
+    sizes = metadata['page_sizes']
+    for page_number, page in enumerate(reader.pages, start=1):
+        width, height = round(float(page.mediabox.width), 2), round(float(page.mediabox.height), 2)
+        if sizes and sizes[-1][2:] == (width, height):
+            sizes[-1] = (sizes[-1][0], page_number, width, height)
+        else:
+            sizes.append((page_number, page_number, width, height))
+
+    return metadata
+
+def get_page(reader, page_number):
+    """
+    Resolve one 1-based page by walking the page tree, using each node's
+    /Count to skip whole subtrees, so only the objects along the path are
+    read. Falls back to reader.pages for trees it can't walk.
+    """
+    if reader.flattened_pages is not None:
+        return reader.pages[page_number - 1]
+
+    try:
+        node = reader.trailer['/Root']['/Pages']
+        index = page_number - 1
+        if index < 0 or index >= node['/Count']:
+            raise IndexError(f"page {page_number} is out of range")
+
+        reference = None
+        inherited = {}
+        while node.get('/Type') == '/Pages' or ('/Type' not in node and '/Kids' in node):
+            for attribute in INHERITABLE_PAGE_ATTRIBUTES:
+                if attribute in node:
+                    inherited[attribute] = node[attribute]
+
+            kids = node['/Kids']
+            if len(kids) == node['/Count']:
+                # A node with as many kids as pages usually holds only leaves: jump straight to ours.
+                child = kids[index].get_object()
+                if child.get('/Type') == '/Page' or ('/Type' not in child and '/Kids' not in child):
+                    reference = kids[index] if isinstance(kids[index], IndirectObject) else None
+                    node = child
+                    break
+
+            for kid in kids:
+                child = kid.get_object()
+                count = child['/Count'] if child.get('/Type') == '/Pages' or '/Kids' in child else 1
+                if index < count:
+                    reference = kid if isinstance(kid, IndirectObject) else None
+                    node = child
+                    break
+                index -= count
+            else:
+                raise ValueError("page tree /Count doesn't match its /Kids")
+    except IndexError:
+        raise
+    except Exception:
+        return reader.pages[page_number - 1]
+
+    page = PageObject(reader, reference)
+    page.update(node)
+    for attribute, value in inherited.items():
+        if attribute not in page:
+            page[NameObject(attribute)] = value
+    return page
+
+@timed(PDF_PAGE_EXTRACT_DURATION)
+def extract_page_text(page):
+    return page.extract_text()
+
+def multiply_matrices(m, n):
+    return [
+        m[0] * n[0] + m[1] * n[2],
+        m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2],
+        m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4],
+        m[4] * n[1] + m[5] * n[3] + n[5],
+    ]
+
+@timed(PDF_PAGE_EXTRACT_DURATION)
+def extract_page_blocks(page):
+    """
+    The text runs of a page, as reported by pypdf's visitor callback, in
+    columns rather than one object per run:
+
+        {"width": 612.0, "height": 792.0, "fonts": ["Helvetica"],
+         "text": ["Hello", "world"], "x": [72.0, 110.5], "y": [720.0, 720.0],
+         "size": [12.0, 12.0], "font": [0, 0], "line": [0, 0]}
+
+    x and y are the run's origin in page space (y grows upwards), size its
+    rendered font size, font an index into fonts and line the run's line,
+    numbered from the top of the page.
+    """
+    texts, xs, ys, sizes, fonts = [], [], [], [], []
+    font_names = {}
+
+    def visit(text, cm, tm, font_dict, font_size):
+        text = text.strip()
+        if not text:
+            return
+        matrix = multiply_matrices(tm, cm)
+        font_name = str(font_dict.get('/BaseFont', ''))[1:] if font_dict else ''
+        texts.append(text)
+        xs.append(round(matrix[4], 2))
+        ys.append(round(matrix[5], 2))
+        sizes.append(round(font_size * math.hypot(matrix[2], matrix[3]), 2))
+        fonts.append(font_names.setdefault(font_name, len(font_names)))
+
+    page.extract_text(visitor_text=visit)
+
+    lines = [0] * len(texts)
+    line, line_y = -1, None
+    for i in sorted(range(len(texts)), key=lambda i: -ys[i]):
+        if line_y is None or line_y - ys[i] > max(sizes[i], 1) * LINE_TOLERANCE:
+            line, line_y = line + 1, ys[i]
+        lines[i] = line
+
+    return {
+        'width': float(page.mediabox.width),
+        'height': float(page.mediabox.height),
+        'fonts': list(font_names),
+        'text': texts,
+        'x': xs,
+        'y': ys,
+        'size': sizes,
+        'font': fonts,
+        'line': lines,
+    }
+
+PAGE_EXTRACTORS = {
+    'text': extract_page_text,
+    'blocks': extract_page_blocks,
+}
+
+def extract_page(page, format='text'):
+    return PAGE_EXTRACTORS[format](page)
+
+def extract_pages(source, page_numbers, format='text'):
+    """Open the PDF once and extract the given pages. Runs inside pool workers."""
+    reader = open_reader(source)
+    return [extract_page(get_page(reader, page_number), format) for page_number in page_numbers]
+
+def get_pool(workers):
+    global _pool, _pool_workers
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # Spawned workers don't inherit the locks held by our job and request threads.
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+def discard_pool(pool):
+    """Drop a broken pool (e.g. a worker was OOM-killed), so the next get_pool() starts a new one."""
+    global _pool, _pool_workers
+
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+            _pool_workers = None
+    pool.shutdown(wait=False)
+
+def shutdown_pool():
+    global _pool, _pool_workers
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+        _pool_workers = None
+
+def iter_pages_parallel(source, page_numbers, workers, chunk_size=None, format='text'):
+    """
+    Split the pages in contiguous chunks and extract them in the pool,
+    yielding (page_number, text) in request order as chunks complete. By
+    default there is one chunk per worker, so every worker parses the
+    document once; smaller chunks trade parsing for a faster first page.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = -(-len(page_numbers) // min(workers, len(page_numbers)))
+    chunks = [page_numbers[i:i + chunk_size] for i in range(0, len(page_numbers), chunk_size)]
+
+    temporary_path = None
+    if isinstance(source, bytes):
+        # Every task is pickled: write the document once and send the workers its path instead.
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+            f.write(source)
+        source = temporary_path = f.name
+
+    try:
+        yield from _iter_chunks_parallel(source, chunks, workers, format)
+    finally:
+        if temporary_path is not None:
+            os.remove(temporary_path)
+
+def _iter_chunks_parallel(source, chunks, workers, format):
+    done = 0
+    for attempt in range(2):
+        pool = get_pool(workers)
+        try:
+            remaining = chunks[done:]
+            results = pool.map(extract_pages, [source] * len(remaining), remaining, [format] * len(remaining))
+            for chunk, chunk_texts in zip(remaining, results):
+                yield from zip(chunk, chunk_texts)
+                done += 1
+            return
+        except BrokenProcessPool:
+            # A dead worker breaks the pool for good; retry the chunks left once, in a new one.
+            discard_pool(pool)
+            if attempt:
+                raise
+            logger.warning("Extraction pool broken, starting a new one")
@@ -0,0 +1,42 @@
+from flask import Blueprint, current_app, jsonify, make_response
+from sqlalchemy import text
+
+from app.extensions import db
+from app.logger import logger
+from app.storage import get_client
+
+health = Blueprint('health', __name__)
+
+@health.route('/', methods=['GET'])
+@health.route('/health', methods=['GET'])
+def liveness():
+    """The process is up and serving requests."""
+    return make_response(jsonify({'status': 'ok'}), 200)
+
+@health.route('/ready', methods=['GET'])
+def readiness():
+    """The database and, in minio mode, the documents bucket can be reached."""
+    checks = {}
+
+    try:
+        db.session.execute(text('SELECT 1'))
+        checks['database'] = 'ok'
+    except Exception as e:
+        db.session.rollback()
+        checks['database'] = str(e)
+
+    if current_app.config['STORAGE_TYPE'] == 'minio':
+        try:
+            get_client().head_bucket(Bucket=current_app.config['STORAGE_DOCUMENTS_BUCKET'])
+            checks['storage'] = 'ok'
+        except Exception as e:
+            checks['storage'] = str(e)
+
+    ready = all(result == 'ok' for result in checks.values())
+    if not ready:
+        logger.error('Readiness check failed', checks)
+
+    return make_response(jsonify({
+        'status': 'ready' if ready else 'unavailable',
+        'checks': checks
+    }), 200 if ready else 503)
@@ -1,78 +1,389 @@
-from flask import Blueprint, request, jsonify, abort, current_app
-from pypdf import PdfReader, PdfWriter
-import logging
-
-from pypdf.generic import NameObject, ArrayObject
+from flask import Blueprint, Response, request, jsonify, abort, current_app, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+import json
+import os
 
+from app.components.extraction import (
+    DEFAULT_MAX_PAGES_PER_REQUEST,
+    DEFAULT_PARALLEL_MIN_PAGES,
+    PAGE_EXTRACTORS,
+    count_pages,
+    extract_page,
+    extract_page_text,
+    get_page,
+    iter_pages_parallel,
+    open_reader,
+    parse_page_ranges,
+)
+from app.components.sanitizer import sanitize
+from app.components.storage import S3RangeReader, download_fileobj_from_minio, get_object_from_minio
+from app.cache import EXTRACTOR_VERSION
+from app.extensions import db, object_cache, reader_cache, text_cache
+from app.http_cache import conditional_response, document_etag, document_last_modified
 from app.logger import logger
-from app.models import Document
-import io
+from app.metrics import PDF_SANITIZE_BYTES_SAVED, PDF_SANITIZE_DURATION
+from app.models import Document, DocumentPage
+from app.search import index_pages
 
 from app.storage import get_client
 
 pdf_toolset = Blueprint('pdf_toolset', __name__)
 
+# Dialects whose INSERT can skip rows that already exist (ON CONFLICT DO NOTHING).
+INSERT_IGNORING_CONFLICTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
 def get_document_record_by_id(document_id):
     document = Document.query.filter_by(id=document_id).first()
     if not document:
-        logger.error(f"Document with id {document_id} not found.")
+        logger.error("Document with id %s not found.", document_id)
         abort(404, description=f"Document with id {document_id} not found.")
     return document
 
 def sanitize_pdf(input, output):
-    print(f"Sanitizing PDF {input} to {output}")
+    """Both input and output may be file paths or binary file objects."""
+    result = sanitize(
+        input,
+        output,
+        remove_javascript=current_app.config.get('PDF_SANITIZE_REMOVE_JAVASCRIPT', True),
+        remove_embedded_files=current_app.config.get('PDF_SANITIZE_REMOVE_EMBEDDED_FILES', True),
+        remove_open_action=current_app.config.get('PDF_SANITIZE_REMOVE_OPEN_ACTION', True),
+    )
+
+    PDF_SANITIZE_DURATION.observe(result.seconds, result='rewritten' if result.rewritten else 'copied')
+    PDF_SANITIZE_BYTES_SAVED.inc(result.bytes_saved)
+
+    if result.rewritten:
+        logger.info("Sanitized PDF in %.3fs: removed %s, %d -> %d bytes (%d saved)", result.seconds,
+                    ', '.join(result.findings), result.input_bytes, result.output_bytes, result.bytes_saved)
+    else:
+        logger.info("PDF had nothing to sanitize, copied %d bytes in %.3fs", result.input_bytes, result.seconds)
+    return result
+
+def extract_all_pages(input):
+    reader = open_reader(input)
+    return [extract_page_text(page) for page in reader.pages]
+
+def get_stored_page_text(document, page):
+    document_page = DocumentPage.query.filter_by(document_id=document.id, page_number=page).first()
+    if document_page is None:
+        return None
+    return document_page.text
+
+def get_stored_pages_text(document, page_numbers):
+    stmt = select(DocumentPage.page_number, DocumentPage.text).where(
+        DocumentPage.document_id == document.id,
+        DocumentPage.page_number.in_(page_numbers)
+    )
+    return dict(db.session.execute(stmt).all())
+
+def store_pages_text(document, texts):
+    """
+    Save lazily extracted text ({page_number: text}) in document_pages, so
+    it is indexed for search like eagerly extracted pages. Pages stored
+    already, by eager extraction or a concurrent request, are skipped by
+    the insert itself. Failures are logged: the text is served either way.
+    """
+    if document.text_stored or not texts:
+        return
+
+    rows = [
+        {'document_id': document.id, 'page_number': page_number, 'text': text}
+        for page_number, text in texts.items()
+    ]
+    try:
+        dialect = db.engine.dialect.name
+        if dialect in INSERT_IGNORING_CONFLICTS:
+            stmt = INSERT_IGNORING_CONFLICTS[dialect](DocumentPage).on_conflict_do_nothing(
+                index_elements=['document_id', 'page_number']
+            ).returning(DocumentPage.id, DocumentPage.document_id, DocumentPage.page_number, DocumentPage.text)
+            # A Core insert bypasses the ORM events that keep the search index in sync.
+            index_pages(db.session.execute(stmt, rows).all())
+        else:
+            stored = set(db.session.execute(select(DocumentPage.page_number).where(
+                DocumentPage.document_id == document.id,
+                DocumentPage.page_number.in_(texts)
+            )).scalars())
+            db.session.add_all(DocumentPage(**row) for row in rows if row['page_number'] not in stored)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Failed to store the text of document %s: %s", document.id, e)
+
+def load_pdf_source(document):
+    """
+    Return what PdfReader opens: a local path (for local storage or objects
+    in the disk cache), the object's bytes or, with STORAGE_RANGED_READS, a
+    seekable reader that fetches byte ranges on demand.
+    """
+    if (current_app.config['STORAGE_TYPE'] == 'minio'):
+        if object_cache.enabled:
+            return object_cache.get_path(document.unique_name, lambda f: download_fileobj_from_minio(
+                current_app.config['STORAGE_DOCUMENTS_BUCKET'], document.unique_name, f
+            ))
+
+        if current_app.config.get('STORAGE_RANGED_READS', False):
+            return S3RangeReader(
+                get_client(),
+                current_app.config['STORAGE_DOCUMENTS_BUCKET'],
+                document.unique_name,
+                block_size=current_app.config.get('STORAGE_RANGE_BLOCK_SIZE', 256 * 1024),
+                readahead_blocks=current_app.config.get('STORAGE_RANGE_READAHEAD_BLOCKS', 2)
+            )
+
+        return get_object_from_minio(current_app.config['STORAGE_DOCUMENTS_BUCKET'], document.unique_name)
+
+    return f"{document.path}"
+
+def get_pdf_reader(document):
+    """Return the document's CachedReader; hold its lock while using the reader."""
+    return reader_cache.get(document, lambda: load_pdf_source(document), open_reader)
+
+def get_cached_page(document, page_number, format='text'):
+    value = text_cache.get(document, page_number, variant=format)
+    if value is not None and format != 'text':
+        return json.loads(value)
+    return value
+
+def cache_page(document, page_number, value, format='text'):
+    if format != 'text':
+        value = json.dumps(value, separators=(',', ':'))
+    text_cache.set(document, page_number, value, variant=format)
+
+def get_known_pages_text(document, page_numbers, format='text'):
+    """Collect the pages already available in the cache or, for plain text, the document_pages table."""
+    texts = {}
+    for page_number in page_numbers:
+        text = get_cached_page(document, page_number, format)
+        if text is not None:
+            texts[page_number] = text
+
+    missing = [page_number for page_number in page_numbers if page_number not in texts]
+    if missing and format == 'text' and document.text_stored:
+        texts.update(get_stored_pages_text(document, missing))
+
+    return texts
+
+def iter_missing_pages(document, page_numbers, streaming=False, format='text'):
+    workers = current_app.config.get('PDF_EXTRACT_WORKERS') or os.cpu_count()
+    parallel_min_pages = current_app.config.get('PDF_PARALLEL_MIN_PAGES', DEFAULT_PARALLEL_MIN_PAGES)
+
+    if workers > 1 and len(page_numbers) >= parallel_min_pages:
+        # When streaming, smaller chunks get the first pages back sooner.
+        chunk_size = -(-len(page_numbers) // (workers * 4)) if streaming else None
+        source = load_pdf_source(document)
+        if isinstance(source, S3RangeReader):
+            # Pool workers need something picklable, so fetch the whole object once.
+            source = source.read_all()
+        return iter_pages_parallel(source, page_numbers, workers, chunk_size, format)
+
+    return iter_cached_reader_pages(get_pdf_reader(document), page_numbers, format)
+
+def iter_cached_reader_pages(entry, page_numbers, format='text'):
+    for page_number in page_numbers:
+        # Only hold the lock while extracting, never while the caller consumes the page.
+        with entry.lock:
+            text = extract_page(get_page(entry.reader, page_number), format)
+        yield page_number, text
+
+def get_known_page_count(document):
+    """The page count stored at upload or cached by an earlier request, if any. Never opens the PDF."""
+    if document.page_count is not None:
+        return document.page_count
+
+    cached_number_of_pages = text_cache.get(document, 0, variant='number_of_pages')
+    if cached_number_of_pages is not None:
+        return int(cached_number_of_pages)
+    return None
+
+def check_page_number(page, number_of_pages):
+    if page < 1 or page > number_of_pages:
+        logger.error("Page %s is out of range 1-%s", page, number_of_pages)
+        abort(400, description=f"Invalid page number: {page} is out of range 1-{number_of_pages}")
 
-    with open(input, 'rb') as file:
-        reader = PdfReader(file)
-        writer = PdfWriter()
+def resolve_pages(document, pages):
+    """Validate a `pages` value and return (number_of_pages, page_numbers)."""
+    number_of_pages = get_known_page_count(document)
 
-        writer.add_metadata({})
+    if number_of_pages is None:
+        entry = get_pdf_reader(document)
+        with entry.lock:
+            number_of_pages = count_pages(entry.reader)
+        text_cache.set(document, 0, str(number_of_pages), variant='number_of_pages')
 
-        for page_num in range(len(reader.pages)):
-            page = reader.pages[page_num]
+    try:
+        page_numbers = parse_page_ranges(pages, number_of_pages)
+    except ValueError as e:
+        logger.error("Invalid pages: %s", e)
+        abort(400, description=f"Invalid pages: {str(e)}")
+
+    max_pages = current_app.config.get('PDF_MAX_PAGES_PER_REQUEST', DEFAULT_MAX_PAGES_PER_REQUEST)
+    if len(page_numbers) > max_pages:
+        abort(400, description=f"Too many pages requested: {len(page_numbers)} (limit is {max_pages})")
+
+    return number_of_pages, page_numbers
+
+def extract_pages_from_pdf(document, pages, format='text'):
+    number_of_pages, page_numbers = resolve_pages(document, pages)
+
+    texts = get_known_pages_text(document, page_numbers, format)
+    missing = [page_number for page_number in page_numbers if page_number not in texts]
+
+    if missing:
+        try:
+            extracted = dict(iter_missing_pages(document, missing, format=format))
+        except Exception as e:
+            logger.error("Failed to extract text from pages %s: %s", pages, e)
+            abort(500, description=f"Failed to extract text from pages {pages}: {str(e)}")
+
+        for page_number, text in extracted.items():
+            cache_page(document, page_number, text, format)
+        texts.update(extracted)
+        if format == 'text':
+            store_pages_text(document, extracted)
+
+    logger.info("Successfully extracted text from %d pages of document %s", len(page_numbers), document.id)
+    return jsonify({
+        "document_name": document.name,
+        "number_of_pages": number_of_pages,
+        "pages": [{"page": page_number, format: texts[page_number]} for page_number in page_numbers]
+    })
+
+def stream_pages_from_pdf(document, pages, format='text'):
+    """Write one JSON line per page, each as soon as its text is available."""
+    number_of_pages, page_numbers = resolve_pages(document, pages)
+
+    known = get_known_pages_text(document, page_numbers, format)
+    missing = [page_number for page_number in page_numbers if page_number not in known]
+
+    def generate():
+        extracted = None
+        extracted_texts = {}
 
-            if "/Annots" in page:
-                page[NameObject("/Annots")] = ArrayObject()
+        for page_number in page_numbers:
+            if page_number in known:
+                text = known.pop(page_number)
+            else:
+                try:
+                    # Opened here, so a source, reader or pool failure is reported like an extraction error.
+                    if extracted is None:
+                        extracted = iter_missing_pages(document, missing, streaming=True, format=format)
+                    _, text = next(extracted)
+                except Exception as e:
+                    # Headers are already sent, so the failure is reported in the stream itself.
+                    logger.error("Failed to extract text from page %s: %s", page_number, e)
+                    yield json.dumps({
+                        "page": page_number,
+                        "error": f"Failed to extract text from page {page_number}: {str(e)}"
+                    }) + "\n"
+                    return
+                cache_page(document, page_number, text, format)
+                extracted_texts[page_number] = text
 
-            writer.add_page(page)
+            yield json.dumps({
+                "page": page_number,
+                "number_of_pages": number_of_pages,
+                format: text
+            }) + "\n"
 
-        with open(output, 'wb') as output_file:
-            print(f"Writing sanitized PDF to {output}")
-            writer.write(output_file)
+        if format == 'text':
+            store_pages_text(document, extracted_texts)
+        logger.info("Successfully streamed %d pages of document %s", len(page_numbers), document.id)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def wants_ndjson():
+    return request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
 
 @pdf_toolset.route('/<int:id>', methods=['GET'])
 def extract_text_from_pdf(id: int):
     page = request.args.get('page')
-    logging.info(f"Extracting text from page {page} of document {id}")
+    format = request.args.get('format', 'text')
+    logger.info("Extracting text from page %s of document %s", page, id)
+
+    if format not in PAGE_EXTRACTORS:
+        abort(400, description=f"Invalid format: {format} (expected {' or '.join(PAGE_EXTRACTORS)})")
 
     document = get_document_record_by_id(id)
 
+    if document.status != 'ready':
+        abort(409, description=f"Document with id {id} is {document.status}.")
+
+    # Validators only need the row, so a revalidation never opens the PDF.
+    streaming = 'pages' in request.args and wants_ndjson()
+    return conditional_response(
+        document_etag(document, format, EXTRACTOR_VERSION, streaming),
+        document_last_modified(document),
+        'CACHE_CONTROL_TEXT',
+        lambda: extract_text(document, page, format),
+        vary='Accept'
+    )
+
+def extract_text(document, page, format='text'):
+    id = document.id
+
+    if 'pages' in request.args:
+        if wants_ndjson():
+            return stream_pages_from_pdf(document, request.args.get('pages'), format)
+        return extract_pages_from_pdf(document, request.args.get('pages'), format)
+
     try:
         page = int(page)
     except Exception as e:
-        logger.error(f"Invalid page number: {str(e)}")
+        logger.error("Invalid page number: %s", e)
         abort(400, description=f"Invalid page number: {str(e)}")
 
-    if (current_app.config['STORAGE_TYPE'] == 'minio'):
-        response_object = get_client().get_object(Bucket=current_app.config['STORAGE_DOCUMENTS_BUCKET'], Key=document.unique_name)
-        pdf_data = response_object['Body'].read()
-        pdf_stream = io.BytesIO(pdf_data)
-        reader = PdfReader(pdf_stream)
-    else:
-        reader = PdfReader(f"{document.path}")
+    # Documents uploaded with their metadata are validated before any storage access.
+    if document.page_count is not None:
+        check_page_number(page, document.page_count)
 
-    number_of_pages = len(reader.pages)
+    text = get_cached_page(document, page, format)
+    number_of_pages = get_known_page_count(document)
+    if text is not None and number_of_pages is not None:
+        logger.info("Serving cached text for page %s of document %s", page, id)
+        return jsonify({
+            "document_name": document.name,
+            "number_of_pages": number_of_pages,
+            format: text,
+            "page": page
+        })
 
-    try:
-        text = reader.pages[int(page) - 1].extract_text()
-    except Exception as e:
-        logger.error(f"Failed to extract text from page {page}: {str(e)}")
-        abort(500, description=f"Failed to extract text from page {page}: {str(e)}")
+    if format == 'text' and document.text_stored:
+        text = get_stored_page_text(document, page)
+        if text is not None:
+            logger.info("Serving stored text for page %s of document %s", page, id)
+            text_cache.set(document, page, text)
+            return jsonify({
+                "document_name": document.name,
+                "number_of_pages": document.page_count,
+                "text": text,
+                "page": page
+            })
+
+    entry = get_pdf_reader(document)
+
+    with entry.lock:
+        number_of_pages = count_pages(entry.reader)
+        check_page_number(page, number_of_pages)
+
+        try:
+            text = extract_page(get_page(entry.reader, page), format)
+        except Exception as e:
+            logger.error("Failed to extract text from page %s: %s", page, e)
+            abort(500, description=f"Failed to extract text from page {page}: {str(e)}")
+
+    cache_page(document, page, text, format)
+    text_cache.set(document, 0, str(number_of_pages), variant='number_of_pages')
+    if format == 'text':
+        store_pages_text(document, {page: text})
 
-    logger.info(f"Successfully extracted text from page {page} of document {id}")
+    logger.info("Successfully extracted text from page %s of document %s", page, id)
     return jsonify({
         "document_name": document.name,
         "number_of_pages": number_of_pages,
-        "text": text,
+        format: text,
         "page": page
     })
@@ -0,0 +1,222 @@
+import os
+import shutil
+import time
+
+from pypdf import PdfReader, PdfWriter
+
+# Entries of the catalog's /Names dictionary removed with JavaScript and embedded files.
+JAVASCRIPT_NAMES = ('/JavaScript',)
+EMBEDDED_FILES_NAMES = ('/EmbeddedFiles',)
+# Action types removed with JavaScript wherever they are attached (e.g. on bookmarks).
+ACTIVE_ACTIONS = ('/JavaScript', '/Launch')
+
+class SanitizeResult:
+    """What sanitize() found in a document and what it cost to remove it."""
+
+    def __init__(self, findings, rewritten, input_bytes, output_bytes, seconds):
+        self.findings = findings
+        self.rewritten = rewritten
+        self.input_bytes = input_bytes
+        self.output_bytes = output_bytes
+        self.seconds = seconds
+
+    @property
+    def bytes_saved(self):
+        return self.input_bytes - self.output_bytes
+
+    def to_dict(self):
+        return {
+            'findings': self.findings,
+            'rewritten': self.rewritten,
+            'input_bytes': self.input_bytes,
+            'output_bytes': self.output_bytes,
+            'bytes_saved': self.bytes_saved,
+            'seconds': self.seconds,
+        }
+
+def iter_page_objects(reader):
+    """
+    Yield the page dictionaries as stored in the reader, so changes to them
+    are seen by a writer cloning the document (reader.pages returns copies).
+    """
+    seen = set()
+    nodes = [reader.trailer['/Root']['/Pages']]
+    while nodes:
+        node = nodes.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+
+        if '/Kids' in node:
+            nodes.extend(kid.get_object() for kid in reversed(node['/Kids']))
+        else:
+            yield node
+
+def iter_outline_items(reader):
+    """Yield the bookmark dictionaries of the outline tree, as stored in the reader."""
+    outlines = reader.trailer['/Root'].get('/Outlines')
+    if outlines is None:
+        return
+
+    seen = set()
+    nodes = [outlines.get_object().get('/First')]
+    while nodes:
+        node = nodes.pop()
+        if node is None:
+            continue
+        node = node.get_object()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+
+        yield node
+        nodes.append(node.get('/Next'))
+        nodes.append(node.get('/First'))
+
+def is_active_action(action):
+    """Whether an action, or any action chained after it with /Next, runs code."""
+    actions = [action]
+    seen = set()
+    while actions:
+        action = actions.pop()
+        if action is None:
+            continue
+        action = action.get_object()
+        if isinstance(action, list):
+            actions.extend(action)
+            continue
+        if id(action) in seen:
+            continue
+        seen.add(id(action))
+
+        if action.get('/S') in ACTIVE_ACTIONS:
+            return True
+        actions.append(action.get('/Next'))
+    return False
+
+def get_names(root):
+    """The catalog's /Names dictionary, which is often an indirect object."""
+    names = root.get('/Names')
+    return names.get_object() if names is not None else {}
+
+def scan(reader):
+    """
+    Return the names of everything sanitize() can remove that the document
+    contains, without changing it. Active content is always reported, so
+    a document carrying any of it is never copied as is unless the caller
+    chose to keep it.
+    """
+    root = reader.trailer['/Root']
+    names = get_names(root)
+    findings = []
+
+    # Our own output carries an empty /Info, which counts as clean.
+    if reader.metadata or '/Metadata' in root:
+        findings.append('metadata')
+    if '/AcroForm' in root or any(page.get('/Annots') for page in iter_page_objects(reader)):
+        findings.append('annotations')
+    if (
+        any(name in names for name in JAVASCRIPT_NAMES)
+        or '/AA' in root
+        or any('/AA' in page for page in iter_page_objects(reader))
+        or any(is_active_action(item.get('/A')) for item in iter_outline_items(reader))
+    ):
+        findings.append('javascript')
+    if any(name in names for name in EMBEDDED_FILES_NAMES):
+        findings.append('embedded_files')
+    if '/OpenAction' in root:
+        findings.append('open_action')
+
+    return findings
+
+def strip(reader, findings):
+    """Remove what scan() found from the reader's objects, before they are cloned."""
+    root = reader.trailer['/Root']
+    names = get_names(root)
+
+    if 'metadata' in findings:
+        reader.trailer.pop('/Info', None)
+        root.pop('/Metadata', None)
+    if 'annotations' in findings:
+        # Form fields are widget annotations, so the form goes with them.
+        root.pop('/AcroForm', None)
+        for page in iter_page_objects(reader):
+            page.pop('/Annots', None)
+    if 'javascript' in findings:
+        root.pop('/AA', None)
+        for name in JAVASCRIPT_NAMES:
+            names.pop(name, None)
+        for page in iter_page_objects(reader):
+            page.pop('/AA', None)
+        # The bookmark stays; only its action goes.
+        for item in iter_outline_items(reader):
+            if is_active_action(item.get('/A')):
+                item.pop('/A', None)
+    if 'embedded_files' in findings:
+        for name in EMBEDDED_FILES_NAMES:
+            names.pop(name, None)
+    if 'open_action' in findings:
+        root.pop('/OpenAction', None)
+
+def sanitize(input, output, remove_javascript=True, remove_embedded_files=True, remove_open_action=True):
+    """
+    Strip metadata, annotations, JavaScript, embedded files and the open
+    action from a PDF; the last three can be kept by passing False. Input
+    and output may be file paths or binary file objects.
+
+    A scan runs first: when there is nothing to remove the input is copied
+    as is. Otherwise the objects to remove are dropped from the parsed
+    document before it is cloned, so they are never copied or written.
+    """
+    started = time.perf_counter()
+    input_bytes = _size(input)
+
+    reader = PdfReader(input)
+    kept = {
+        'javascript': not remove_javascript,
+        'embedded_files': not remove_embedded_files,
+        'open_action': not remove_open_action,
+    }
+    findings = [finding for finding in scan(reader) if not kept.get(finding)]
+
+    if findings:
+        strip(reader, findings)
+        writer = PdfWriter(clone_from=reader)
+        output_bytes = _write(writer, output)
+    else:
+        output_bytes = _copy(input, output)
+
+    return SanitizeResult(findings, bool(findings), input_bytes, output_bytes, time.perf_counter() - started)
+
+def _size(input):
+    if isinstance(input, (str, os.PathLike)):
+        return os.path.getsize(input)
+    size = input.seek(0, os.SEEK_END)
+    input.seek(0)
+    return size
+
+def _write(writer, output):
+    if isinstance(output, (str, os.PathLike)):
+        writer.write(output)
+        return os.path.getsize(output)
+    start = output.tell()
+    writer.write(output)
+    return output.tell() - start
+
+def _copy(input, output):
+    if isinstance(input, (str, os.PathLike)) and isinstance(output, (str, os.PathLike)):
+        shutil.copyfile(input, output)
+        return os.path.getsize(output)
+
+    input_file = open(input, 'rb') if isinstance(input, (str, os.PathLike)) else input
+    output_file = open(output, 'wb') if isinstance(output, (str, os.PathLike)) else output
+    try:
+        input_file.seek(0)
+        start = output_file.tell()
+        shutil.copyfileobj(input_file, output_file)
+        return output_file.tell() - start
+    finally:
+        if input_file is not input:
+            input_file.close()
+        if output_file is not output:
+            output_file.close()
@@ -1,9 +1,201 @@
+from collections import OrderedDict
+import io
+
+from boto3.s3.transfer import TransferConfig
+from flask import current_app
+
+from app.logger import logger
+from app.metrics import STORAGE_REQUEST_DURATION, timed
 from app.storage import get_client
 
+# The most keys S3 accepts in one DeleteObjects request.
+DELETE_OBJECTS_BATCH_SIZE = 1000
+
+def get_transfer_config():
+    chunksize = int(current_app.config.get('STORAGE_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))
+    return TransferConfig(
+        multipart_threshold=chunksize,
+        multipart_chunksize=chunksize,
+        max_concurrency=int(current_app.config.get('STORAGE_MULTIPART_CONCURRENCY', 4))
+    )
+
 # Example usage:
 # upload_file_to_minio('path/to/your/file.txt', 'my-bucket', 'file.txt')
+@timed(STORAGE_REQUEST_DURATION, operation='upload')
 def upload_file_to_minio(file_path, bucket_name, object_name):
     try:
-        get_client().upload_file(file_path, bucket_name, object_name)
+        get_client().upload_file(file_path, bucket_name, object_name, Config=get_transfer_config())
     except Exception as e:
-        print(f"Error occurred: {e}")
+        logger.error("Failed to upload %s to bucket %s: %s", object_name, bucket_name, e)
+        # The caller must not record a document whose object isn't there.
+        raise
+
+@timed(STORAGE_REQUEST_DURATION, operation='upload')
+def upload_fileobj_to_minio(fileobj, bucket_name, object_name):
+    """Upload straight from a file object, in parts when it is larger than the multipart chunk size."""
+    get_client().upload_fileobj(fileobj, bucket_name, object_name, Config=get_transfer_config())
+
+@timed(STORAGE_REQUEST_DURATION, operation='download')
+def download_fileobj_from_minio(bucket_name, object_name, fileobj):
+    get_client().download_fileobj(bucket_name, object_name, fileobj)
+
+@timed(STORAGE_REQUEST_DURATION, operation='get')
+def get_object_from_minio(bucket_name, object_name):
+    return get_client().get_object(Bucket=bucket_name, Key=object_name)['Body'].read()
+
+@timed(STORAGE_REQUEST_DURATION, operation='get')
+def open_object_from_minio(bucket_name, object_name, byte_range=None):
+    """
+    Start a GET without reading the body: returns the get_object response,
+    whose 'Body' is read in chunks by the caller. byte_range is an HTTP
+    Range header value.
+    """
+    params = {'Bucket': bucket_name, 'Key': object_name}
+    if byte_range:
+        params['Range'] = byte_range
+    return get_client().get_object(**params)
+
+def presign_object_from_minio(bucket_name, object_name, expires_in, content_type=None, content_disposition=None):
+    """A URL that lets its holder GET the object, without credentials, for expires_in seconds."""
+    params = {'Bucket': bucket_name, 'Key': object_name}
+    if content_type:
+        params['ResponseContentType'] = content_type
+    if content_disposition:
+        params['ResponseContentDisposition'] = content_disposition
+    return get_client().generate_presigned_url('get_object', Params=params, ExpiresIn=expires_in)
+
+@timed(STORAGE_REQUEST_DURATION, operation='delete')
+def delete_objects_from_minio(bucket_name, object_names):
+    """Delete objects with as few DeleteObjects calls as possible. Returns the keys that could not be deleted."""
+    object_names = list(object_names)
+    failed = []
+    for start in range(0, len(object_names), DELETE_OBJECTS_BATCH_SIZE):
+        response = get_client().delete_objects(Bucket=bucket_name, Delete={
+            'Objects': [{'Key': name} for name in object_names[start:start + DELETE_OBJECTS_BATCH_SIZE]],
+            'Quiet': True
+        })
+        failed.extend(error['Key'] for error in response.get('Errors', []))
+    return failed
+
+class S3RangeReader(io.RawIOBase):
+    """
+    Read-only, seekable file over an S3 object. Bytes are fetched with
+    ranged GETs in fixed-size blocks that are kept in a small LRU, and a
+    miss also fetches the next few blocks. PdfReader only touches the
+    trailer, the xref table and the objects it resolves, so reading one
+    page of a large PDF downloads a fraction of the file.
+    """
+
+    def __init__(self, client, bucket, key, block_size=256 * 1024, readahead_blocks=2, max_blocks=64):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.block_size = block_size
+        self.readahead_blocks = readahead_blocks
+        self.max_blocks = max_blocks
+        self.position = 0
+        self.size = None
+        self.blocks = OrderedDict()
+        self.requests = 0
+        self.bytes_fetched = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self._get_size() + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+
+        if self.position < 0:
+            raise ValueError("Negative seek position")
+        return self.position
+
+    def read(self, size=-1):
+        total = self._get_size()
+        end = total if size is None or size < 0 else min(self.position + size, total)
+        if self.position >= end:
+            return b''
+
+        chunks = []
+        while self.position < end:
+            index, offset = divmod(self.position, self.block_size)
+            block = self._get_block(index)
+            chunk = block[offset:offset + end - self.position]
+            chunks.append(chunk)
+            self.position += len(chunk)
+
+        return b''.join(chunks)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readall(self):
+        return self.read()
+
+    @timed(STORAGE_REQUEST_DURATION, operation='get')
+    def read_all(self):
+        """Download the whole object in a single GET."""
+        response = self.client.get_object(Bucket=self.bucket, Key=self.key)
+        data = response['Body'].read()
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        return data
+
+    def _get_size(self):
+        if self.size is None:
+            # A suffix range returns the total size and the trailer in one request.
+            data, self.size = self._fetch(f"bytes=-{self.block_size}")
+            last_index = (self.size - 1) // self.block_size if self.size else 0
+            last_start = last_index * self.block_size
+            self._store(last_index, data[last_start - (self.size - len(data)):])
+        return self.size
+
+    def _get_block(self, index):
+        if index in self.blocks:
+            self.blocks.move_to_end(index)
+            return self.blocks[index]
+
+        last_index = (self._get_size() - 1) // self.block_size
+        end_index = index
+        while (end_index < last_index and end_index - index < self.readahead_blocks
+               and end_index + 1 not in self.blocks):
+            end_index += 1
+
+        start = index * self.block_size
+        end = min((end_index + 1) * self.block_size, self.size) - 1
+        data, _ = self._fetch(f"bytes={start}-{end}")
+
+        for offset, block_index in enumerate(range(index, end_index + 1)):
+            self._store(block_index, data[offset * self.block_size:(offset + 1) * self.block_size])
+
+        return self.blocks[index]
+
+    def _store(self, index, data):
+        self.blocks[index] = data
+        self.blocks.move_to_end(index)
+        while len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+
+    @timed(STORAGE_REQUEST_DURATION, operation='range_get')
+    def _fetch(self, byte_range):
+        response = self.client.get_object(Bucket=self.bucket, Key=self.key, Range=byte_range)
+        data = response['Body'].read()
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        # Content-Range looks like "bytes 0-1023/4096".
+        size = int(response['ContentRange'].rsplit('/', 1)[1])
+        return data, size
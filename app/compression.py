@@ -0,0 +1,193 @@
+from collections import OrderedDict
+import threading
+import zlib
+
+from flask import current_app, request
+
+try:
+    import zstandard
+except ImportError:  # Optional: pip install zstandard
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli
+    brotli = None
+
+DEFAULT_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain')
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        compressor = self.compressobj()
+        return compressor.compress(data) + compressor.flush()
+
+    def compressobj(self):
+        # wbits=31: a gzip header and trailer around the deflate stream.
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def stream(self, chunks):
+        compressor = self.compressobj()
+        for chunk in chunks:
+            # A sync flush per chunk, so every NDJSON line reaches the client as it is produced.
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def stream(self, chunks):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        yield compressor.flush()
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.level)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+def available_encoders(config):
+    """Encoders in order of preference, skipping the ones whose library isn't installed."""
+    encoders = []
+    if zstandard is not None:
+        encoders.append(ZstdEncoder(int(config['COMPRESS_ZSTD_LEVEL'])))
+    if brotli is not None:
+        encoders.append(BrotliEncoder(int(config['COMPRESS_BROTLI_LEVEL'])))
+    encoders.append(GzipEncoder(int(config['COMPRESS_GZIP_LEVEL'])))
+    return encoders
+
+class CompressedBodyCache:
+    """
+    Bounded LRU of compressed bodies, keyed by URL, ETag and encoding, so
+    a representation that was already compressed (e.g. cached page text)
+    is served again without compressing it per request.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+class Compression:
+    """
+    Compresses responses with the best encoding the client accepts (zstd,
+    br or gzip, as installed). Bodies under COMPRESS_MIN_SIZE are left
+    alone; streamed responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_ZSTD_LEVEL', 3)
+        app.config.setdefault('COMPRESS_BROTLI_LEVEL', 4)
+        app.config.setdefault('COMPRESS_CACHE_MAX_BYTES', 16 * 1024 * 1024)
+
+        if not app.config['COMPRESS_ENABLED']:
+            return
+
+        app.extensions['compression'] = {
+            'encoders': available_encoders(app.config),
+            'cache': CompressedBodyCache(int(app.config['COMPRESS_CACHE_MAX_BYTES'])),
+        }
+        app.after_request(self._compress_response)
+
+    def choose_encoder(self):
+        encoders = current_app.extensions['compression']['encoders']
+        best = request.accept_encodings.best_match([encoder.name for encoder in encoders])
+        return next((encoder for encoder in encoders if encoder.name == best), None)
+
+    def _compress_response(self, response):
+        if (not 200 <= response.status_code < 300 or response.status_code in (204, 206)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or 'Content-Range' in response.headers
+                or response.mimetype not in current_app.config['COMPRESS_MIMETYPES']):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoder = self.choose_encoder()
+        if encoder is None:
+            return response
+
+        if response.is_streamed:
+            response.response = stream_encoded(encoder, response.response, response.iter_encoded())
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+                return response
+            response.set_data(self._compress_body(encoder, data, response.get_etag()[0]))
+
+        response.headers['Content-Encoding'] = encoder.name
+        return response
+
+    def _compress_body(self, encoder, data, etag):
+        # Only bodies with a validator can be reused: the ETag identifies the representation.
+        if not etag:
+            return encoder.compress(data)
+
+        cache = current_app.extensions['compression']['cache']
+        key = (request.full_path, etag, encoder.name)
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = encoder.compress(data)
+            cache.set(key, compressed)
+        return compressed
+
+def stream_encoded(encoder, iterable, chunks):
+    try:
+        yield from encoder.stream(chunks)
+    finally:
+        # The server only closes our generator; close the original body too (e.g. stream_with_context).
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+compression = Compression()
@@ -15,6 +15,69 @@ class Config:
     STORAGE_ACCESS_KEY = config.get('STORAGE_ACCESS_KEY', None)
     STORAGE_SECRET_KEY = config.get('STORAGE_SECRET_KEY', None)
     STORAGE_REGION = config.get('STORAGE_REGION', None)
+    STORAGE_MAX_POOL_CONNECTIONS = int(config.get('STORAGE_MAX_POOL_CONNECTIONS', 50))
+    STORAGE_CONNECT_TIMEOUT = int(config.get('STORAGE_CONNECT_TIMEOUT', 5))
+    STORAGE_READ_TIMEOUT = int(config.get('STORAGE_READ_TIMEOUT', 60))
+    STORAGE_MAX_RETRIES = int(config.get('STORAGE_MAX_RETRIES', 3))
+    STORAGE_RETRY_MODE = config.get('STORAGE_RETRY_MODE', 'standard')
+    STORAGE_STREAMING_UPLOAD = config.get('STORAGE_STREAMING_UPLOAD', 'false').lower() == 'true'
+    STORAGE_DOWNLOAD_REDIRECT = config.get('STORAGE_DOWNLOAD_REDIRECT', 'false').lower() == 'true'
+    STORAGE_PRESIGNED_URL_EXPIRES = int(config.get('STORAGE_PRESIGNED_URL_EXPIRES', 300))
+    STORAGE_MULTIPART_CHUNKSIZE = int(config.get('STORAGE_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))
+    STORAGE_MULTIPART_CONCURRENCY = int(config.get('STORAGE_MULTIPART_CONCURRENCY', 4))
+    STORAGE_RANGED_READS = config.get('STORAGE_RANGED_READS', 'false').lower() == 'true'
+    STORAGE_RANGE_BLOCK_SIZE = int(config.get('STORAGE_RANGE_BLOCK_SIZE', 256 * 1024))
+    STORAGE_RANGE_READAHEAD_BLOCKS = int(config.get('STORAGE_RANGE_READAHEAD_BLOCKS', 2))
     # PDF configuration
     PDF_SANITIZE = config.get('PDF_SANITIZE', False)
-
+    PDF_SANITIZE_REMOVE_JAVASCRIPT = config.get('PDF_SANITIZE_REMOVE_JAVASCRIPT', 'true').lower() == 'true'
+    PDF_SANITIZE_REMOVE_EMBEDDED_FILES = config.get('PDF_SANITIZE_REMOVE_EMBEDDED_FILES', 'true').lower() == 'true'
+    PDF_SANITIZE_REMOVE_OPEN_ACTION = config.get('PDF_SANITIZE_REMOVE_OPEN_ACTION', 'true').lower() == 'true'
+    PDF_EAGER_EXTRACTION = config.get('PDF_EAGER_EXTRACTION', 'false').lower() == 'true'
+    # Empty: the CPU count, shared out among the server's worker processes (see app.serving).
+    PDF_EXTRACT_WORKERS = int(config.get('PDF_EXTRACT_WORKERS') or 0)
+    PDF_PARALLEL_MIN_PAGES = int(config.get('PDF_PARALLEL_MIN_PAGES', 4))
+    PDF_MAX_PAGES_PER_REQUEST = int(config.get('PDF_MAX_PAGES_PER_REQUEST', 100))
+    # Listing configuration
+    DOCUMENTS_PAGE_SIZE = int(config.get('DOCUMENTS_PAGE_SIZE', 100))
+    DOCUMENTS_MAX_PAGE_SIZE = int(config.get('DOCUMENTS_MAX_PAGE_SIZE', 1000))
+    SEARCH_MAX_RESULTS = int(config.get('SEARCH_MAX_RESULTS', 100))
+    BULK_MAX_IDS = int(config.get('BULK_MAX_IDS', 1000))
+    # Upload configuration
+    UPLOAD_DEDUPLICATE = config.get('UPLOAD_DEDUPLICATE', 'false').lower() == 'true'
+    BATCH_MAX_FILES = int(config.get('BATCH_MAX_FILES', 1000))
+    BATCH_UPLOAD_WORKERS = int(config.get('BATCH_UPLOAD_WORKERS', 4))
+    # Background processing configuration
+    UPLOAD_ASYNC = config.get('UPLOAD_ASYNC', 'false').lower() == 'true'
+    JOBS_WORKERS = int(config.get('JOBS_WORKERS', 2))
+    JOBS_POLL_INTERVAL = int(config.get('JOBS_POLL_INTERVAL', 10))
+    JOBS_LEASE_TIMEOUT = int(config.get('JOBS_LEASE_TIMEOUT', 600))
+    JOBS_MAX_ATTEMPTS = int(config.get('JOBS_MAX_ATTEMPTS', 3))
+    # Extracted text cache configuration
+    TEXT_CACHE_BACKEND = config.get('TEXT_CACHE_BACKEND', 'memory')
+    TEXT_CACHE_MAX_BYTES = int(config.get('TEXT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    TEXT_CACHE_FOLDER = config.get('TEXT_CACHE_FOLDER', 'cache/text')
+    # Parsed PdfReader cache
+    READER_CACHE_MAX_BYTES = int(config.get('READER_CACHE_MAX_BYTES', 128 * 1024 * 1024))
+    # Local disk cache for objects read from the bucket
+    OBJECT_CACHE_MAX_BYTES = int(config.get('OBJECT_CACHE_MAX_BYTES', 0))
+    OBJECT_CACHE_FOLDER = config.get('OBJECT_CACHE_FOLDER', 'cache/objects')
+    # HTTP caching (Cache-Control of GET responses)
+    CACHE_CONTROL_DOCUMENT = config.get('CACHE_CONTROL_DOCUMENT', 'no-cache')
+    CACHE_CONTROL_TEXT = config.get('CACHE_CONTROL_TEXT', 'no-cache')
+    CACHE_CONTROL_FILE = config.get('CACHE_CONTROL_FILE', 'no-cache')
+    # Response compression (gzip, plus zstd and br when their packages are installed)
+    COMPRESS_ENABLED = config.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(config.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(config.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_ZSTD_LEVEL = int(config.get('COMPRESS_ZSTD_LEVEL', 3))
+    COMPRESS_BROTLI_LEVEL = int(config.get('COMPRESS_BROTLI_LEVEL', 4))
+    COMPRESS_CACHE_MAX_BYTES = int(config.get('COMPRESS_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    # Logging
+    LOG_LEVEL = config.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = config.get('LOG_FORMAT', 'json')
+    LOG_FILE = config.get('LOG_FILE', 'app.log')
+    # Metrics
+    METRICS_ENABLED = config.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_PATH = config.get('METRICS_PATH', '/metrics')
+    METRICS_SYNC_INTERVAL = int(config.get('METRICS_SYNC_INTERVAL', 5))
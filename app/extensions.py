@@ -1,3 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
\ No newline at end of file
+from app.cache import ObjectCache, ReaderCache, TextCache
+
+db = SQLAlchemy()
+text_cache = TextCache()
+object_cache = ObjectCache()
+reader_cache = ReaderCache()
@@ -0,0 +1,67 @@
+"""
+Validators and Cache-Control for GET responses. Views compute the ETag
+and Last-Modified of a representation from the document row alone, so a
+matching If-None-Match or If-Modified-Since is answered with 304 before
+the response (or the PDF behind it) is built.
+"""
+from datetime import timezone
+import hashlib
+
+from flask import current_app, make_response, request
+
+DEFAULT_CACHE_CONTROL = 'no-cache'
+
+def document_etag(document, *parts):
+    """
+    Identifies a representation of document: changes when the row is
+    updated or the stored content changes, and with any extra parts
+    (e.g. the extractor version).
+    """
+    updated_at = document.updated_at.isoformat() if document.updated_at else ''
+    identity = document.content_hash or f"{document.unique_name}:{document.path}"
+    value = ':'.join(str(part) for part in (document.id, identity, updated_at, *parts))
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()[:32]
+
+def document_last_modified(document):
+    if document.updated_at is None:
+        return None
+    # updated_at is stored as naive UTC; HTTP dates have second precision.
+    return document.updated_at.replace(tzinfo=timezone.utc, microsecond=0)
+
+def is_not_modified(etag, last_modified):
+    # If-None-Match takes precedence, and is compared weakly.
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+def conditional_response(etag, last_modified, cache_control_key, build, vary=None, weak=True):
+    """
+    Answer 304 when the request's validators match, otherwise build() the
+    response. Either way it carries the ETag (weak by default, so it
+    survives content encoding; byte ranges need a strong one),
+    Last-Modified and the Cache-Control configured under cache_control_key.
+    """
+    if is_not_modified(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(build())
+
+    if response.status_code >= 400:
+        return response
+
+    response.set_etag(etag, weak=weak)
+    if last_modified is not None:
+        response.last_modified = last_modified
+
+    set_cache_control(response, cache_control_key)
+    if vary:
+        response.vary.add(vary)
+    return response
+
+def set_cache_control(response, cache_control_key):
+    cache_control = current_app.config.get(cache_control_key, DEFAULT_CACHE_CONTROL)
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
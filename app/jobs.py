@@ -0,0 +1,206 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+import threading
+import time
+
+import click
+import schedule
+from flask import current_app
+from sqlalchemy import select, update
+
+from app.extensions import db
+from app.logger import logger
+from app.models import Document, Job
+
+class JobQueue:
+    """
+    Runs document processing outside of the request. Jobs are persisted in
+    the jobs table, so any process (a web worker or `flask jobs work`) can
+    claim and execute them without an external broker. A claim is a lease
+    of JOBS_LEASE_TIMEOUT seconds: jobs still running after that are
+    assumed lost with their process and are queued again by the pollers,
+    up to JOBS_MAX_ATTEMPTS runs.
+    """
+
+    def __init__(self, app=None):
+        self.handlers = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('UPLOAD_ASYNC', False)
+        app.config.setdefault('JOBS_WORKERS', 2)
+        app.config.setdefault('JOBS_POLL_INTERVAL', 10)
+        app.config.setdefault('JOBS_LEASE_TIMEOUT', 600)
+        app.config.setdefault('JOBS_MAX_ATTEMPTS', 3)
+
+        app.extensions['job_queue'] = self._new_state()
+        app.cli.add_command(jobs_cli)
+
+    def _new_state(self):
+        return {
+            'executor': None,
+            'futures': set(),
+            # Ids submitted to the executor and not finished yet, so polls don't queue them again.
+            'submitted': set(),
+            'scheduler': None,
+            'lock': threading.Lock(),
+        }
+
+    def handler(self, job_type):
+        def decorator(func):
+            self.handlers[job_type] = func
+            return func
+        return decorator
+
+    def enqueue(self, job_type, document_id):
+        job = Job(type=job_type, document_id=document_id, status='pending')
+        db.session.add(job)
+        db.session.commit()
+        logger.info("Job %s (%s) queued for document %s", job.id, job_type, document_id)
+
+        if current_app.config['JOBS_WORKERS'] > 0:
+            self.start()
+            self.submit(job.id)
+
+        return job
+
+    def start(self):
+        """Start the worker pool and the poller that picks up jobs left pending (e.g. after a restart)."""
+        state = current_app.extensions['job_queue']
+        with state['lock']:
+            if state['executor'] is not None:
+                return
+
+            app = current_app._get_current_object()
+            state['executor'] = ThreadPoolExecutor(
+                max_workers=app.config['JOBS_WORKERS'], thread_name_prefix='jobs'
+            )
+
+            if app.config['JOBS_POLL_INTERVAL'] > 0:
+                scheduler = schedule.Scheduler()
+                scheduler.every(app.config['JOBS_POLL_INTERVAL']).seconds.do(self._submit_pending, app)
+                state['scheduler'] = scheduler
+                threading.Thread(target=self._run_scheduler, args=(scheduler,), daemon=True).start()
+
+    def reset(self):
+        """
+        Forget the executor and poller inherited from a forking master (its
+        threads don't survive the fork), so this process starts its own.
+        """
+        current_app.extensions['job_queue'] = self._new_state()
+
+    def submit(self, job_id):
+        app = current_app._get_current_object()
+        state = app.extensions['job_queue']
+        with state['lock']:
+            if job_id in state['submitted']:
+                return
+            state['submitted'].add(job_id)
+
+        future = state['executor'].submit(self._run_in_context, app, job_id)
+        state['futures'].add(future)
+        future.add_done_callback(state['futures'].discard)
+        future.add_done_callback(lambda _: state['submitted'].discard(job_id))
+
+    def wait(self, timeout=None):
+        """Block until every job submitted by this process has finished."""
+        wait(list(current_app.extensions['job_queue']['futures']), timeout=timeout)
+
+    def _run_scheduler(self, scheduler):
+        while True:
+            scheduler.run_pending()
+            time.sleep(1)
+
+    def _submit_pending(self, app):
+        with app.app_context():
+            requeue_expired_jobs()
+            for job_id in pending_job_ids():
+                self.submit(job_id)
+
+    def _run_in_context(self, app, job_id):
+        with app.app_context():
+            self.run(job_id)
+
+    def run(self, job_id):
+        # Claiming is a conditional update, so a job is only ever run by one worker.
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == 'pending')
+            .values(status='running', attempts=Job.attempts + 1, started_at=datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            return
+
+        job = db.session.get(Job, job_id)
+        try:
+            self.handlers[job.type](job)
+            job.status = 'done'
+            db.session.commit()
+            logger.info("Job %s (%s) finished", job_id, job.type)
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            db.session.commit()
+            logger.error("Job %s (%s) failed: %s", job_id, job.type, e)
+
+def requeue_expired_jobs():
+    """
+    Put jobs whose lease expired back in the queue, or fail them (and their
+    pending document) once they have used JOBS_MAX_ATTEMPTS runs.
+    """
+    expired = (Job.status == 'running') & (
+        Job.started_at < datetime.utcnow() - timedelta(seconds=current_app.config['JOBS_LEASE_TIMEOUT'])
+    )
+    max_attempts = current_app.config['JOBS_MAX_ATTEMPTS']
+
+    exhausted = db.session.execute(
+        select(Job.id, Job.document_id).where(expired, Job.attempts >= max_attempts)
+    ).all()
+    if exhausted:
+        # The conditional updates keep a concurrent poller from acting on the same jobs twice.
+        db.session.execute(
+            update(Job)
+            .where(expired, Job.id.in_([row.id for row in exhausted]))
+            .values(status='failed', error=f'Lease expired after {max_attempts} attempts')
+        )
+        db.session.execute(
+            update(Document)
+            .where(Document.id.in_([row.document_id for row in exhausted]), Document.status == 'pending')
+            .values(status='failed')
+        )
+
+    requeued = db.session.execute(
+        update(Job).where(expired, Job.attempts < max_attempts).values(status='pending')
+    ).rowcount
+    db.session.commit()
+
+    if requeued or exhausted:
+        logger.warning("Requeued %d jobs with an expired lease and failed %d", requeued, len(exhausted))
+
+def pending_job_ids():
+    return db.session.execute(
+        select(Job.id).where(Job.status == 'pending').order_by(Job.id)
+    ).scalars().all()
+
+job_queue = JobQueue()
+
+@click.group('jobs')
+def jobs_cli():
+    """Document processing jobs."""
+
+@jobs_cli.command('work')
+@click.option('--interval', default=1, help='Seconds to wait between polls when idle.')
+def work(interval):
+    """Process pending jobs in this process until interrupted."""
+    logger.info("Job worker started")
+    while True:
+        requeue_expired_jobs()
+        job_ids = pending_job_ids()
+        for job_id in job_ids:
+            job_queue.run(job_id)
+        if not job_ids:
+            time.sleep(interval)
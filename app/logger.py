@@ -1,13 +1,131 @@
+from collections.abc import Mapping
+import atexit
+import copy
+from datetime import datetime, timezone
+import json
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import uuid
 
-def setup_logger():
-    logging.basicConfig(level=logging.DEBUG,
-                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                        handlers=[
-                            logging.FileHandler("app.log"),
-                            logging.StreamHandler()
-                        ])
-    logger = logging.getLogger(__name__)
-    return logger
-
-logger = setup_logger()
+from flask import g, has_request_context, request
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+logger = logging.getLogger(__name__)
+
+_listener = None
+
+class RequestIdFilter(logging.Filter):
+    """Tags records with the id of the request being handled, while still in the request's thread."""
+
+    def filter(self, record):
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+class RequestQueueHandler(QueueHandler):
+    """
+    Hands records over to the listener thread. Only the message is merged
+    here; a mapping passed as the only argument, as in
+    logger.error('Error listing documents', {'error': ...}), is kept as the
+    record's context for the JSON output.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.context = dict(record.args) if isinstance(record.args, Mapping) else None
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        if getattr(record, 'context', None):
+            entry['context'] = record.context
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        message = super().format(record)
+        if getattr(record, 'request_id', None):
+            message = f"{message} [request_id={record.request_id}]"
+        if getattr(record, 'context', None):
+            message = f"{message} {json.dumps(record.context, default=str)}"
+        return message
+
+def setup_logging(app):
+    """
+    Route every log record through a queue: request threads only enqueue,
+    and a listener thread formats and writes to the console and LOG_FILE.
+    """
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.config.setdefault('LOG_FORMAT', 'json')
+    app.config.setdefault('LOG_FILE', 'app.log')
+
+    start_logging(app)
+
+    app.before_request(assign_request_id)
+    app.after_request(add_request_id_header)
+
+def start_logging(app):
+    """
+    Start the listener thread, replacing the previous one. Threads don't
+    survive fork, so forked workers call this again.
+    """
+    global _listener
+
+    stop_logging()
+
+    formatter = JsonFormatter() if app.config['LOG_FORMAT'] == 'json' else TextFormatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if app.config['LOG_FILE']:
+        handlers.append(logging.FileHandler(app.config['LOG_FILE']))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = RequestQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in [handler for handler in root.handlers if isinstance(handler, RequestQueueHandler)]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(app.config['LOG_LEVEL'].upper())
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+def stop_logging():
+    """Flush the queue and close the handlers of the running listener."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def assign_request_id():
+    g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+
+def add_request_id_header(response):
+    if 'request_id' in g:
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
+
+atexit.register(stop_logging)
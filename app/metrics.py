@@ -0,0 +1,398 @@
+from contextlib import contextmanager
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: processes don't share a store there.
+    fcntl = None
+
+from flask import Response, current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.extensions import object_cache, reader_cache, text_cache
+from app.storage import storage_clients
+
+# Seconds; from a fast cache lookup up to a slow full-document operation.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_registry = []
+_sources = []
+_collectors = []
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """A metric family kept in this process and rendered in the Prometheus text format."""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self):
+        """A copy of the values of this process, keyed by label values."""
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    def render(self, values=None):
+        """Exposition lines for values (by default, this process's own)."""
+        if values is None:
+            values = self.snapshot()
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for key, value in sorted(values.items()):
+            lines.extend(self._samples(list(zip(self.labelnames, key)), value))
+        return lines
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Replace the total, for counts kept elsewhere (e.g. cache statistics)."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _copy(self, value):
+        return value
+
+    def _merge(self, value, other):
+        return value + other
+
+    def _samples(self, labels, value):
+        return [f'{self.name}{_format_labels(labels)} {_format_value(value)}']
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _copy(self, value):
+        counts, total = value
+        return (list(counts), total)
+
+    def _merge(self, value, other):
+        return ([a + b for a, b in zip(value[0], other[0])], value[1] + other[1])
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self, labels, value):
+        counts, total = value
+        samples = [
+            f'{self.name}_bucket{_format_labels(labels + [("le", _format_value(bound))])} {count}'
+            for bound, count in zip(self.buckets, counts)
+        ]
+        samples.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+        samples.append(f'{self.name}_count{_format_labels(labels)} {counts[-1]}')
+        return samples
+
+def timed(histogram, **labels):
+    """Decorator observing the duration of every call in histogram."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def source(func):
+    """Register func() to copy counts kept elsewhere into metrics before they are read."""
+    _sources.append(func)
+    return func
+
+def collector(func):
+    """
+    Register func(values) as a source of extra exposition lines, computed
+    at scrape time from the merged values of every metric, by name.
+    """
+    _collectors.append(func)
+    return func
+
+def snapshot():
+    """The values of every metric in this process, by metric name and label values."""
+    for func in _sources:
+        func()
+    return {metric.name: metric.snapshot() for metric in _registry}
+
+def merge(snapshots):
+    merged = {metric.name: {} for metric in _registry}
+    metrics_by_name = {metric.name: metric for metric in _registry}
+    for values in snapshots:
+        for name, metric_values in values.items():
+            if name not in metrics_by_name:
+                continue
+            metric, totals = metrics_by_name[name], merged[name]
+            for key, value in metric_values.items():
+                totals[key] = metric._merge(totals[key], value) if key in totals else metric._copy(value)
+    return merged
+
+def render(store=None):
+    """
+    The exposition of this process's values or, with a store, of the
+    values of every process sharing it.
+    """
+    own = snapshot()
+    values = merge([own] + store.read_others()) if store is not None else own
+
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render(values[metric.name]))
+    for func in _collectors:
+        lines.extend(func(values))
+    return '\n'.join(lines) + '\n'
+
+class SharedStore:
+    """
+    Lets the worker processes of one server report the same totals, the
+    way prometheus_client's multiprocess mode does: each process writes a
+    snapshot of its values to a file in `folder` every `sync_interval`
+    seconds, and a scrape adds up its own values and every other file. A
+    process that exits folds its final values into a common file, so
+    counters never go backwards when workers are recycled. Snapshots
+    read the stats of `app`'s caches.
+    """
+
+    def __init__(self, app, folder):
+        self.app = app
+        self.folder = folder
+        self.sync_interval = app.config['METRICS_SYNC_INTERVAL']
+        # Not just the pid: a recycled worker may get the pid of an exited one.
+        self.path = os.path.join(folder, f'{os.getpid()}-{uuid.uuid4().hex}.json')
+        self.exited_path = os.path.join(folder, 'exited.json')
+        self.lock_path = os.path.join(folder, '.lock')
+
+    def start(self):
+        self.write()
+        threading.Thread(target=self._sync, daemon=True, name='metrics-sync').start()
+
+    def write(self):
+        with self.app.app_context():
+            self._dump(snapshot(), self.path)
+
+    def read_others(self):
+        with self._lock():
+            return [
+                self._load(os.path.join(self.folder, name))
+                for name in os.listdir(self.folder)
+                if name.endswith('.json') and os.path.join(self.folder, name) != self.path
+            ]
+
+    def retire(self):
+        """Fold this process's final values into the exited processes' totals."""
+        with self._lock():
+            exited = [self._load(self.exited_path)] if os.path.exists(self.exited_path) else []
+            with self.app.app_context():
+                values = snapshot()
+            self._dump(merge(exited + [values]), self.exited_path)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _sync(self):
+        while True:
+            time.sleep(self.sync_interval)
+            self.write()
+
+    @contextmanager
+    def _lock(self):
+        # Readers and retire() must not see a process both in its own file and in the exited totals.
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _dump(self, values, path):
+        data = {name: [[list(key), value] for key, value in metric_values.items()] for name, metric_values in values.items()}
+        # Written aside and renamed, so readers never see a partial file.
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temporary_path, path)
+
+    def _load(self, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {name: {tuple(key): value for key, value in metric_values} for name, metric_values in data.items()}
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent handling requests (until the response body starts).',
+    ('method', 'endpoint', 'status')
+)
+DB_QUERY_DURATION = Histogram(
+    'db_query_duration_seconds', 'Time spent executing SQL statements.', ('operation',)
+)
+STORAGE_REQUEST_DURATION = Histogram(
+    'storage_request_duration_seconds', 'Time spent in object storage calls.', ('operation',)
+)
+PDF_PARSE_DURATION = Histogram(
+    'pdf_parse_duration_seconds', 'Time spent opening PDFs (reading the xref table and trailer).'
+)
+PDF_PAGE_EXTRACT_DURATION = Histogram(
+    'pdf_page_extract_duration_seconds', 'Time spent extracting the text of one page.'
+)
+PDF_SANITIZE_DURATION = Histogram(
+    'pdf_sanitize_duration_seconds', 'Time spent sanitizing uploads.', ('result',)
+)
+PDF_SANITIZE_BYTES_SAVED = Counter(
+    'pdf_sanitize_bytes_saved_total', 'Bytes removed from uploads by sanitization.'
+)
+
+CACHE_HITS = Counter('cache_hits_total', 'Cache lookups answered by the cache.', ('cache',))
+CACHE_MISSES = Counter('cache_misses_total', 'Cache lookups that had to compute or fetch the value.', ('cache',))
+STORAGE_CLIENTS_CREATED = Counter('storage_clients_created_total', 'S3 clients built.')
+STORAGE_CLIENTS_REUSED = Counter('storage_clients_reused_total', 'Storage calls that reused the shared S3 client.')
+
+@source
+def collect_cache_stats():
+    stats = {
+        'text': text_cache.stats(),
+        'reader': reader_cache.stats(),
+        'object': object_cache.stats(),
+    }
+    for cache, values in stats.items():
+        CACHE_HITS.set(values['hits'], cache=cache)
+        CACHE_MISSES.set(values['misses'], cache=cache)
+
+@source
+def collect_storage_stats():
+    stats = storage_clients.stats()
+    STORAGE_CLIENTS_CREATED.set(stats['clients_created'])
+    STORAGE_CLIENTS_REUSED.set(stats['clients_reused'])
+
+@collector
+def collect_cache_hit_ratio(values):
+    lines = [
+        '# HELP cache_hit_ratio Share of lookups answered by the cache.',
+        '# TYPE cache_hit_ratio gauge',
+    ]
+    hits, misses = values[CACHE_HITS.name], values[CACHE_MISSES.name]
+    for key in sorted(hits):
+        lookups = hits[key] + misses.get(key, 0)
+        lines.append(f'cache_hit_ratio{{cache="{key[0]}"}} {_format_value(hits[key] / lookups if lookups else 0.0)}')
+    return lines
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+    DB_QUERY_DURATION.observe(time.perf_counter() - started, operation=operation)
+
+@event.listens_for(Engine, 'handle_error')
+def _discard_query_timer(context):
+    if context.connection is not None and context.connection.info.get('query_started'):
+        context.connection.info['query_started'].pop()
+
+class Metrics:
+    """
+    Exposes the metrics above at METRICS_PATH and times every request.
+    Values are kept per process unless share() gives the processes of a
+    server a common store (gunicorn.conf.py does), so that any worker
+    answers a scrape with the totals of all of them.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_PATH', '/metrics')
+        app.config.setdefault('METRICS_SYNC_INTERVAL', 5)
+
+        app.extensions['metrics'] = {'store': None}
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        app.before_request(self._start_timer)
+        app.after_request(self._observe_request)
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', self.expose)
+
+    def _start_timer(self):
+        g.request_started = time.perf_counter()
+
+    def _observe_request(self, response):
+        started = g.pop('request_started', None)
+        if started is not None and request.endpoint != 'metrics':
+            REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                method=request.method,
+                endpoint=request.endpoint or 'unknown',
+                status=response.status_code,
+            )
+        return response
+
+    def share(self, app, folder):
+        """Report this process's values through the store in folder, and read the others' from it."""
+        if not app.config['METRICS_ENABLED'] or fcntl is None:
+            return
+        store = SharedStore(app, folder)
+        store.start()
+        app.extensions['metrics']['store'] = store
+
+    def retire(self, app):
+        """Keep the values of a process that is exiting in the shared totals."""
+        store = app.extensions['metrics']['store']
+        if store is not None:
+            store.retire()
+
+    def expose(self):
+        return Response(render(current_app.extensions['metrics']['store']), content_type=CONTENT_TYPE)
+
+metrics = Metrics()
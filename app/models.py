@@ -1,23 +1,44 @@
 from datetime import datetime
 
 from app.extensions import db
-from typing import Optional
-from sqlalchemy import String, DateTime, Integer
-from sqlalchemy.orm import Mapped, mapped_column
+from typing import List, Optional
+from sqlalchemy import BigInteger, Boolean, Float, ForeignKey, Index, String, DateTime, Integer, Text, UniqueConstraint, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 class Document(db.Model):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index('ix_documents_name', 'name'),
+        Index('ix_documents_created_at_id', 'created_at', 'id'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(150), nullable=False)
     unique_name: Mapped[str] = mapped_column(String(150), nullable=False)
     path: Mapped[str] = mapped_column(String(150), nullable=False)
+    page_count: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    size_bytes: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    pdf_version: Mapped[Optional[str]] = mapped_column(String(10), nullable=True)
+    producer: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    encrypted: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
+    # Whether eager extraction stored every page's text in document_pages.
+    text_stored: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default='ready', nullable=False)
     updated_at: Mapped[Optional[DateTime]] = mapped_column(
-        DateTime(timezone=False), default=datetime.utcnow, nullable=False
+        DateTime(timezone=False), onupdate=datetime.utcnow, default=datetime.utcnow, nullable=False
     )
     created_at: Mapped[Optional[DateTime]] = mapped_column(
-        DateTime(timezone=False), onupdate=datetime.utcnow, default=datetime.utcnow, nullable=False
+        DateTime(timezone=False), default=datetime.utcnow, nullable=False
+    )
+
+    pages: Mapped[List["DocumentPage"]] = relationship(
+        back_populates="document", cascade="all, delete-orphan"
+    )
+    page_sizes: Mapped[List["DocumentPageSize"]] = relationship(
+        cascade="all, delete-orphan", order_by="DocumentPageSize.first_page"
     )
+    jobs: Mapped[List["Job"]] = relationship(cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
@@ -25,9 +46,102 @@ class Document(db.Model):
             'name': self.name,
             'unique_name': self.unique_name,
             'path': self.path,
+            'page_count': self.page_count,
+            'content_hash': self.content_hash,
+            'size_bytes': self.size_bytes,
+            'pdf_version': self.pdf_version,
+            'producer': self.producer,
+            'encrypted': self.encrypted,
+            'text_stored': self.text_stored,
+            'status': self.status,
             'updated_at': self.updated_at,
             'created_at': self.created_at
         }
 
     def __repr__(self) -> str:
         return f'<Document {self.id}>'
+
+class DocumentPageSize(db.Model):
+    """The MediaBox size of a run of consecutive pages, so a uniform document takes a single row."""
+    __tablename__ = "document_page_sizes"
+    __table_args__ = (
+        UniqueConstraint('document_id', 'first_page'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    document_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('documents.id', ondelete='CASCADE'), nullable=False
+    )
+    first_page: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_page: Mapped[int] = mapped_column(Integer, nullable=False)
+    width: Mapped[float] = mapped_column(Float, nullable=False)
+    height: Mapped[float] = mapped_column(Float, nullable=False)
+
+    def to_dict(self):
+        return {
+            'first_page': self.first_page,
+            'last_page': self.last_page,
+            'width': self.width,
+            'height': self.height
+        }
+
+    def __repr__(self) -> str:
+        return f'<DocumentPageSize {self.document_id}:{self.first_page}-{self.last_page}>'
+
+class DocumentPage(db.Model):
+    __tablename__ = "document_pages"
+    __table_args__ = (
+        UniqueConstraint('document_id', 'page_number'),
+        # Full-text search on PostgreSQL; SQLite uses the FTS5 table created by app.search.
+        Index(
+            'ix_document_pages_text_fts', text("to_tsvector('simple', text)"), postgresql_using='gin'
+        ).ddl_if(dialect='postgresql'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    document_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('documents.id', ondelete='CASCADE'), nullable=False
+    )
+    page_number: Mapped[int] = mapped_column(Integer, nullable=False)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+
+    document: Mapped["Document"] = relationship(back_populates="pages")
+
+    def __repr__(self) -> str:
+        return f'<DocumentPage {self.document_id}:{self.page_number}>'
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    type: Mapped[str] = mapped_column(String(50), nullable=False)
+    document_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('documents.id', ondelete='CASCADE'), nullable=False, index=True
+    )
+    status: Mapped[str] = mapped_column(String(20), default='pending', nullable=False, index=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # When the current run claimed the job; its lease runs from here.
+    started_at: Mapped[Optional[DateTime]] = mapped_column(DateTime(timezone=False), nullable=True)
+    updated_at: Mapped[Optional[DateTime]] = mapped_column(
+        DateTime(timezone=False), default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+    created_at: Mapped[Optional[DateTime]] = mapped_column(
+        DateTime(timezone=False), default=datetime.utcnow, nullable=False
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'document_id': self.document_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'started_at': self.started_at,
+            'updated_at': self.updated_at,
+            'created_at': self.created_at
+        }
+
+    def __repr__(self) -> str:
+        return f'<Job {self.id}>'
@@ -0,0 +1,125 @@
+import re
+
+from sqlalchemy import bindparam, event, select, text
+
+from app.extensions import db
+from app.models import Document, DocumentPage
+
+FTS_TABLE = 'document_pages_fts'
+SNIPPET_WORDS = 12
+
+class SearchIndex:
+    """
+    Full-text index over the text stored in document_pages. SQLite keeps
+    an FTS5 table in sync with document_pages (see the listeners below);
+    PostgreSQL uses a GIN index on to_tsvector(text) declared on the
+    model. Other databases fall back to a LIKE scan.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_MAX_RESULTS', 100)
+
+    @property
+    def dialect(self):
+        return db.engine.dialect.name
+
+    def create_all(self):
+        """Create what create_all can't: the SQLite FTS5 table."""
+        if self.dialect == 'sqlite':
+            with db.engine.begin() as connection:
+                connection.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                    "USING fts5(text, document_id UNINDEXED, page_number UNINDEXED)"
+                ))
+
+    def search(self, query, limit):
+        """Return ranked hits as dicts with document_id, document_name, page, snippet and rank."""
+        if self.dialect == 'sqlite':
+            rows = self._search_sqlite(query, limit)
+        elif self.dialect == 'postgresql':
+            rows = self._search_postgresql(query, limit)
+        else:
+            rows = self._search_like(query, limit)
+
+        names = dict(db.session.execute(
+            select(Document.id, Document.name).where(Document.id.in_({row[0] for row in rows}))
+        ).all())
+
+        return [{
+            'document_id': document_id,
+            'document_name': names.get(document_id),
+            'page': page_number,
+            'snippet': snippet,
+            'rank': rank,
+        } for document_id, page_number, snippet, rank in rows]
+
+    def _search_sqlite(self, query, limit):
+        # Quote every term so user input is never parsed as FTS5 syntax.
+        terms = ' '.join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+        # bm25() is lower for better matches, so it is negated into a "higher is better" rank.
+        return db.session.execute(text(
+            f"SELECT document_id, page_number, "
+            f"snippet({FTS_TABLE}, 0, '<b>', '</b>', '...', {SNIPPET_WORDS}), -bm25({FTS_TABLE}) AS rank "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :terms ORDER BY rank DESC LIMIT :limit"
+        ), {'terms': terms, 'limit': limit}).all()
+
+    def _search_postgresql(self, query, limit):
+        return db.session.execute(text(
+            "SELECT document_id, page_number, "
+            "ts_headline('simple', text, query, 'StartSel=<b>, StopSel=</b>, MaxWords=25, MinWords=10'), "
+            "ts_rank(to_tsvector('simple', text), query) AS rank "
+            "FROM document_pages, plainto_tsquery('simple', :query) query "
+            "WHERE to_tsvector('simple', text) @@ query ORDER BY rank DESC LIMIT :limit"
+        ), {'query': query, 'limit': limit}).all()
+
+    def _search_like(self, query, limit):
+        rows = db.session.execute(
+            select(DocumentPage.document_id, DocumentPage.page_number, DocumentPage.text)
+            .where(DocumentPage.text.ilike(f"%{query}%"))
+            .order_by(DocumentPage.document_id, DocumentPage.page_number)
+            .limit(limit)
+        ).all()
+        return [(document_id, page_number, make_snippet(page_text, query), 0.0)
+                for document_id, page_number, page_text in rows]
+
+def make_snippet(page_text, query):
+    match = re.search(re.escape(query), page_text, re.IGNORECASE)
+    if match is None:
+        return page_text[:200]
+    start = max(match.start() - 80, 0)
+    return f"{page_text[start:match.start()]}<b>{match.group(0)}</b>{page_text[match.end():match.end() + 80]}"
+
+@event.listens_for(DocumentPage, 'after_insert')
+def index_page(mapper, connection, target):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, text, document_id, page_number) VALUES (:id, :text, :document_id, :page_number)"),
+            {'id': target.id, 'text': target.text, 'document_id': target.document_id, 'page_number': target.page_number}
+        )
+
+@event.listens_for(DocumentPage, 'after_delete')
+def unindex_page(mapper, connection, target):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': target.id})
+
+def index_pages(rows):
+    """For inserts that bypass the ORM events: rows of (id, document_id, page_number, text)."""
+    if db.engine.dialect.name == 'sqlite' and rows:
+        db.session.execute(
+            text(f"INSERT INTO {FTS_TABLE} (rowid, text, document_id, page_number) VALUES (:id, :text, :document_id, :page_number)"),
+            [{'id': row.id, 'text': row.text, 'document_id': row.document_id, 'page_number': row.page_number} for row in rows]
+        )
+
+def unindex_documents(document_ids):
+    """For bulk deletes that bypass the ORM events."""
+    if db.engine.dialect.name == 'sqlite' and document_ids:
+        db.session.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE document_id IN :ids").bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(document_ids)}
+        )
+
+search_index = SearchIndex()
@@ -0,0 +1,59 @@
+"""
+Process lifecycle hooks for preforking servers, used by gunicorn.conf.py.
+"""
+import os
+
+from sqlalchemy.orm import configure_mappers
+
+from app.extensions import db
+from app.jobs import job_queue
+from app.logger import logger, start_logging
+from app.metrics import metrics
+from app.storage import storage_clients
+
+def warm_up(app):
+    """
+    Do the one-off startup work in the master, before it forks, so every
+    worker shares it and serves its first request warm: the SQLAlchemy
+    mappers and botocore's S3 model.
+    """
+    configure_mappers()
+    with app.app_context():
+        storage_clients.warm_up()
+        # Workers must open their own connections.
+        db.engine.dispose()
+    logger.info('Application preloaded')
+
+def reset_after_fork(app, server_workers=1, metrics_folder=None):
+    """
+    Replace what a forked worker can't share with the master: threads,
+    sockets and pooled connections. Unless PDF_EXTRACT_WORKERS is set, the
+    CPUs are also shared out between the `server_workers` processes, so
+    their extraction pools don't each start a process per CPU. With async
+    uploads, the job threads start right away, so jobs left pending or
+    lost by previous workers are picked up without waiting for an upload.
+    Given a metrics_folder, the workers report their metrics through it,
+    so a scrape answered by any of them returns the totals.
+    """
+    if not app.config.get('PDF_EXTRACT_WORKERS'):
+        app.config['PDF_EXTRACT_WORKERS'] = max(1, (os.cpu_count() or 1) // server_workers)
+
+    start_logging(app)
+    with app.app_context():
+        db.engine.dispose(close=False)
+        storage_clients.reset()
+        job_queue.reset()
+        if app.config['UPLOAD_ASYNC'] and app.config['JOBS_WORKERS'] > 0:
+            job_queue.start()
+    if metrics_folder:
+        metrics.share(app, metrics_folder)
+    logger.info('Worker %s started', os.getpid())
+
+def drain(app, timeout):
+    """
+    Let the jobs this worker started finish before it exits (e.g. when it
+    is recycled), then hand its metrics over to the shared totals.
+    """
+    with app.app_context():
+        job_queue.wait(timeout=timeout)
+    metrics.retire(app)
@@ -1,18 +1,98 @@
 from flask import current_app
+import os
+import threading
+
 import boto3
 from botocore.client import Config
 
-def get_client():
-    minio_url = current_app.config['STORAGE_URL']
-    access_key = current_app.config['STORAGE_ACCESS_KEY']
-    secret_key = current_app.config['STORAGE_SECRET_KEY']
-    region_name = current_app.config['STORAGE_REGION']
+class StorageClients:
+    """
+    Keeps one S3 client per app and process, so every storage call shares
+    the same warm connection pool instead of building a client (and
+    loading botocore's service models) each time. boto3 clients are
+    thread-safe once created; creation itself is serialized here.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STORAGE_MAX_POOL_CONNECTIONS', 50)
+        app.config.setdefault('STORAGE_CONNECT_TIMEOUT', 5)
+        app.config.setdefault('STORAGE_READ_TIMEOUT', 60)
+        app.config.setdefault('STORAGE_MAX_RETRIES', 3)
+        app.config.setdefault('STORAGE_RETRY_MODE', 'standard')
+
+        app.extensions['storage'] = {
+            'session': None,
+            'client': None,
+            'pid': None,
+            'lock': threading.Lock(),
+            'created': 0,
+            'reused': 0,
+        }
+
+    def get_client(self):
+        state = current_app.extensions['storage']
+
+        with state['lock']:
+            # A client inherited through fork shares sockets with the parent, so each process builds its own.
+            if state['client'] is None or state['pid'] != os.getpid():
+                state['client'] = create_client(current_app.config, state['session'])
+                state['pid'] = os.getpid()
+                state['created'] += 1
+            else:
+                state['reused'] += 1
 
-    return boto3.client(
+            return state['client']
+
+    def warm_up(self):
+        """
+        Create the boto3 session and build a client once, so botocore's S3
+        model is loaded in this process. Workers forked afterwards inherit
+        the session and build their own client without loading it again.
+        """
+        state = current_app.extensions['storage']
+        with state['lock']:
+            if state['session'] is None:
+                state['session'] = boto3.session.Session()
+            create_client(current_app.config, state['session'])
+
+    def reset(self):
+        state = current_app.extensions['storage']
+        with state['lock']:
+            state['client'] = None
+            state['pid'] = None
+
+    def stats(self):
+        state = current_app.extensions['storage']
+        return {
+            'clients_created': state['created'],
+            'clients_reused': state['reused'],
+        }
+
+def create_client(config, session=None):
+    return (session or boto3.session.Session()).client(
         's3',
-        endpoint_url=minio_url,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        config=Config(signature_version='s3v4'),
-        region_name=region_name
-    )
\ No newline at end of file
+        endpoint_url=config['STORAGE_URL'],
+        aws_access_key_id=config['STORAGE_ACCESS_KEY'],
+        aws_secret_access_key=config['STORAGE_SECRET_KEY'],
+        config=Config(
+            signature_version='s3v4',
+            max_pool_connections=int(config['STORAGE_MAX_POOL_CONNECTIONS']),
+            connect_timeout=int(config['STORAGE_CONNECT_TIMEOUT']),
+            read_timeout=int(config['STORAGE_READ_TIMEOUT']),
+            retries={
+                'max_attempts': int(config['STORAGE_MAX_RETRIES']),
+                'mode': config['STORAGE_RETRY_MODE'],
+            },
+            tcp_keepalive=True,
+        ),
+        region_name=config['STORAGE_REGION']
+    )
+
+storage_clients = StorageClients()
+
+def get_client():
+    return storage_clients.get_client()
@@ -0,0 +1,10 @@
+"""
+Entry point for production WSGI servers:
+
+    gunicorn -c gunicorn.conf.py app.wsgi:app
+"""
+from app import create_app
+from app.serving import warm_up
+
+app = create_app()
+warm_up(app)
@@ -0,0 +1,34 @@
+"""Synthetic PDFs for the benchmarks, generated with reportlab."""
+from io import BytesIO
+
+from reportlab.pdfgen import canvas
+
+LINE = "the quick brown fox jumps over the lazy dog"
+
+def create_pdf(pages, lines_per_page=40, annotated=False):
+    """
+    Return the bytes of a PDF with `pages` pages of text. `lines_per_page`
+    controls the size of each page (up to about 45 lines fit); annotated
+    documents also carry metadata and a link on every page.
+    """
+    pdf = BytesIO()
+    c = canvas.Canvas(pdf)
+    if annotated:
+        c.setAuthor('Benchmark')
+
+    for page in range(1, pages + 1):
+        for line in range(lines_per_page):
+            c.drawString(72, 760 - line * 16, f"Page {page}, line {line}: {LINE}.")
+        if annotated:
+            c.linkURL('https://example.com', (72, 40, 200, 60))
+        c.showPage()
+
+    c.save()
+    return pdf.getvalue()
+
+def build_corpus(page_counts, lines_per_page=40):
+    """One annotated document per page count, keyed by a name such as "10p"."""
+    return {
+        f"{pages}p": create_pdf(pages, lines_per_page, annotated=True)
+        for pages in page_counts
+    }
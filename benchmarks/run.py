@@ -0,0 +1,267 @@
+"""
+Benchmark the upload, extraction, sanitization and listing hot paths.
+
+    python -m benchmarks.run --pages 1,10,100 --iterations 20 --output results.json
+    python -m benchmarks.run --compare baseline.json
+
+Requests go through the Flask test client against a throwaway SQLite
+database and upload folder; minio scenarios run against moto. Every
+scenario reports latency percentiles and throughput from timed runs, and
+the peak traced memory of one extra run under tracemalloc. Results are
+written as JSON and, with --compare, checked against a previous run.
+"""
+import argparse
+from datetime import datetime, timezone
+from io import BytesIO
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import boto3
+from moto import mock_aws
+
+from app import create_app
+from app.components.pdf_toolset import sanitize_pdf
+from app.extensions import db
+from app.models import Document
+from benchmarks.corpus import build_corpus
+
+BUCKET = 'benchmark'
+SCENARIOS = ('upload', 'extract', 'sanitize', 'list')
+
+def make_config(folder, storage_type, log_level):
+    class BenchmarkConfig:
+        LOG_LEVEL = log_level
+        LOG_FILE = ''
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(folder, f'{storage_type}.db')}"
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        UPLOAD_FOLDER = os.path.join(folder, f'{storage_type}-uploads')
+        ALLOWED_EXTENSIONS = {'pdf'}
+        STORAGE_TYPE = storage_type
+        STORAGE_URL = None
+        STORAGE_ACCESS_KEY = 'benchmark'
+        STORAGE_SECRET_KEY = 'benchmark'
+        STORAGE_REGION = 'us-east-1'
+        STORAGE_DOCUMENTS_BUCKET = BUCKET
+        PDF_SANITIZE = True
+        PDF_EXTRACT_WORKERS = 1
+        # Measure extraction itself rather than cache hits.
+        TEXT_CACHE_BACKEND = 'none'
+
+    os.makedirs(BenchmarkConfig.UPLOAD_FOLDER, exist_ok=True)
+    return BenchmarkConfig
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def measure(operation, iterations, warmup):
+    """Call operation(i) warmup + iterations times and summarize the timed calls."""
+    for i in range(warmup):
+        operation(i)
+
+    timings = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        operation(warmup + i)
+        timings.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    operation(warmup + iterations)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'mean_ms': sum(timings) / len(timings) * 1000,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p90_ms': percentile(timings, 90) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+        'max_ms': timings[-1] * 1000,
+        'ops_per_second': iterations / elapsed,
+        'peak_memory_kb': peak / 1024,
+    }
+
+def check(response, status=200):
+    if response.status_code != status:
+        raise RuntimeError(f"Unexpected {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+def upload(client, content, name='benchmark.pdf'):
+    return check(client.post(
+        '/documents/', data={'file': (BytesIO(content), name)}, content_type='multipart/form-data'
+    )).get_json()
+
+def bench_upload(app, client, corpus, args, storage_type):
+    results = {}
+    for name, content in corpus.items():
+        results[f"upload[{storage_type}-{name}]"] = measure(
+            lambda i: upload(client, content), args.iterations, args.warmup
+        )
+    return results
+
+def bench_extract(app, client, corpus, args, storage_type):
+    results = {}
+    for name, content in corpus.items():
+        document = upload(client, content)
+        page_count = int(name.rstrip('p'))
+
+        def extract(i):
+            check(client.get(f"/pdf-text/{document['id']}?page={i % page_count + 1}"))
+
+        results[f"extract[{storage_type}-{name}]"] = measure(extract, args.iterations, args.warmup)
+    return results
+
+def bench_sanitize(app, client, corpus, args, storage_type):
+    results = {}
+    for name, content in corpus.items():
+        results[f"sanitize[{name}]"] = measure(
+            lambda i: sanitize_pdf(BytesIO(content), BytesIO()), args.iterations, args.warmup
+        )
+    return results
+
+def bench_list(app, client, corpus, args, storage_type):
+    db.session.execute(db.insert(Document), [
+        {'name': f'document-{i}.pdf', 'unique_name': f'document-{i}.pdf', 'path': f'document-{i}.pdf'}
+        for i in range(args.documents)
+    ])
+    db.session.commit()
+
+    cursors = [None]
+    response = check(client.get(f'/documents/?limit={args.list_limit}'))
+    while 'X-Next-Cursor' in response.headers:
+        cursors.append(response.headers['X-Next-Cursor'])
+        response = check(client.get(f"/documents/?limit={args.list_limit}&cursor={cursors[-1]}"))
+
+    def list_page(i):
+        cursor = cursors[i % len(cursors)]
+        check(client.get(f'/documents/?limit={args.list_limit}' + (f'&cursor={cursor}' if cursor else '')))
+
+    return {f"list[{args.documents}docs-limit{args.list_limit}]": measure(list_page, args.iterations, args.warmup)}
+
+BENCHMARKS = {
+    'upload': bench_upload,
+    'extract': bench_extract,
+    'sanitize': bench_sanitize,
+    'list': bench_list,
+}
+
+def run_storage(storage_type, folder, corpus, args):
+    app = create_app(config_class=make_config(folder, storage_type, 'INFO' if args.verbose else 'WARNING'))
+    client = app.test_client()
+    results = {}
+
+    with app.app_context():
+        if storage_type == 'minio':
+            boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+
+        for scenario in args.scenarios:
+            # Sanitization and listing don't touch storage, so they only run once.
+            if scenario in ('sanitize', 'list') and storage_type != args.storage[0]:
+                continue
+            print(f"Running {scenario} ({storage_type})", file=sys.stderr)
+            results.update(BENCHMARKS[scenario](app, client, corpus, args, storage_type))
+
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold):
+    """Print the p50 change of every scenario and return the names of regressions."""
+    regressions = []
+    print(f"{'scenario':<40} {'baseline p50':>13} {'p50':>10} {'change':>8}")
+    for name, result in results.items():
+        previous = baseline['results'].get(name)
+        if previous is None:
+            print(f"{name:<40} {'-':>13} {result['p50_ms']:>10.2f} {'new':>8}")
+            continue
+
+        change = (result['p50_ms'] - previous['p50_ms']) / previous['p50_ms'] * 100
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = ' !'
+        print(f"{name:<40} {previous['p50_ms']:>13.2f} {result['p50_ms']:>10.2f} {change:>+7.1f}%{flag}")
+    return regressions
+
+def print_results(results):
+    print(f"{'scenario':<40} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'peak KiB':>10}")
+    for name, result in results.items():
+        print(f"{name:<40} {result['p50_ms']:>9.2f} {result['p90_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+              f"{result['ops_per_second']:>9.1f} {result['peak_memory_kb']:>10.0f}")
+
+def parse_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=lambda value: [int(pages) for pages in parse_list(value)], default=[1, 10, 100],
+                        help='Comma-separated page counts of the generated documents.')
+    parser.add_argument('--lines-per-page', type=int, default=40, help='Lines of text per page (controls page size).')
+    parser.add_argument('--scenarios', type=parse_list, default=list(SCENARIOS), help=f"Any of {', '.join(SCENARIOS)}.")
+    parser.add_argument('--storage', type=parse_list, default=['local', 'minio'], help='local, minio (moto) or both.')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--documents', type=int, default=10000, help='Rows created for the listing benchmark.')
+    parser.add_argument('--list-limit', type=int, default=100)
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='A previous JSON result to compare with.')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='p50 increase, in percent, reported as a regression by --compare.')
+    parser.add_argument('--verbose', action='store_true', help="Keep the application's log output.")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    corpus = build_corpus(args.pages, args.lines_per_page)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as folder, mock_aws():
+        for storage_type in args.storage:
+            results.update(run_storage(storage_type, folder, corpus, args))
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'arguments': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+            'corpus_bytes': {name: len(content) for name, content in corpus.items()},
+        },
+        'results': results,
+    }
+
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold}%: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Compare the sanitizer with the implementation it replaced.
+
+    python -m benchmarks.sanitize --pages 200 --repeat 5
+
+Two documents are generated with reportlab: one with metadata and a link
+annotation on every page, which has to be rewritten, and a clean copy
+(the first one, sanitized), which the new sanitizer copies as is.
+"""
+import argparse
+from io import BytesIO
+import statistics
+import time
+import tracemalloc
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, NameObject
+
+from app.components.sanitizer import sanitize
+from benchmarks.corpus import create_pdf
+
+def legacy_sanitize(input, output):
+    """sanitize_pdf before the rework: every page is copied into a new writer."""
+    reader = PdfReader(input)
+    writer = PdfWriter()
+
+    writer.add_metadata({})
+
+    for page_num in range(len(reader.pages)):
+        page = reader.pages[page_num]
+
+        if "/Annots" in page:
+            page[NameObject("/Annots")] = ArrayObject()
+
+        writer.add_page(page)
+
+    writer.write(output)
+
+def measure(func, content, repeat):
+    timings = []
+    peak = 0
+    output_bytes = 0
+
+    for _ in range(repeat):
+        output = BytesIO()
+        tracemalloc.start()
+        started = time.perf_counter()
+        func(BytesIO(content), output)
+        timings.append(time.perf_counter() - started)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        output_bytes = len(output.getvalue())
+
+    return {
+        'median_ms': statistics.median(timings) * 1000,
+        'min_ms': min(timings) * 1000,
+        'peak_kb': peak / 1024,
+        'output_bytes': output_bytes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    annotated = create_pdf(args.pages, annotated=True)
+    clean = BytesIO()
+    sanitize(BytesIO(annotated), clean)
+    corpora = {'annotated': annotated, 'clean': clean.getvalue()}
+
+    print(f"{'document':<10} {'implementation':<15} {'median ms':>10} {'min ms':>10} {'peak KiB':>10} {'output bytes':>13}")
+    for name, content in corpora.items():
+        for implementation, func in (('legacy', legacy_sanitize), ('sanitize', sanitize)):
+            result = measure(func, content, args.repeat)
+            print(f"{name:<10} {implementation:<15} {result['median_ms']:>10.1f} {result['min_ms']:>10.1f} "
+                  f"{result['peak_kb']:>10.0f} {result['output_bytes']:>13}")
+
+if __name__ == '__main__':
+    main()
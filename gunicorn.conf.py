@@ -0,0 +1,52 @@
+"""
+Production serving profile:
+
+    gunicorn -c gunicorn.conf.py app.wsgi:app
+
+Every setting can be overridden with the GUNICORN_* variables below or
+with gunicorn's own command line options.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:80')
+
+# PDF parsing is CPU bound and holds the GIL, so it scales with processes;
+# the threads of each worker cover the time spent waiting on storage and
+# the database. Each worker's extraction pool gets CPU count / workers
+# processes (see app.serving.reset_after_fork), so the two don't multiply.
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+
+# Build the app (and load botocore's models) once in the master; workers
+# fork from it instead of each importing and initializing everything.
+preload_app = True
+
+# Recycle workers after a while to bound memory growth from parsed PDFs,
+# with jitter so they don't all restart at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+# Workers write their metrics here, so whichever one answers a scrape
+# reports the totals of all of them (see app.metrics.SharedStore).
+metrics_folder = tempfile.mkdtemp(prefix='pdf-metrics-')
+
+def post_fork(server, worker):
+    from app.serving import reset_after_fork
+    reset_after_fork(server.app.wsgi(), server.cfg.workers, metrics_folder)
+
+def worker_exit(server, worker):
+    from app.serving import drain
+    drain(server.app.wsgi(), graceful_timeout)
+
+def on_exit(server):
+    shutil.rmtree(metrics_folder, ignore_errors=True)
@@ -0,0 +1,41 @@
+"""create document pages table
+
+Revision ID: 5d2e8f41a7c3
+Revises: 138b7b24c945
+Create Date: 2026-10-18 09:12:04.118245
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8f41a7c3'
+down_revision: Union[str, None] = '138b7b24c945'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('page_count', sa.Integer(), nullable=True))
+
+    op.create_table(
+        'document_pages',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('page_number', sa.Integer(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.UniqueConstraint('document_id', 'page_number')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('document_pages')
+
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.drop_column('page_count')
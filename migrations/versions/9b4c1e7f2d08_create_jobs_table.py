@@ -0,0 +1,51 @@
+"""create jobs table
+
+Revision ID: 9b4c1e7f2d08
+Revises: 5d2e8f41a7c3
+Create Date: 2026-10-18 10:02:51.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4c1e7f2d08'
+down_revision: Union[str, None] = '5d2e8f41a7c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'documents',
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='ready')
+    )
+
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=False), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=False), nullable=False),
+
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE')
+    )
+    op.create_index('ix_jobs_document_id', 'jobs', ['document_id'])
+    op.create_index('ix_jobs_status', 'jobs', ['status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status', table_name='jobs')
+    op.drop_index('ix_jobs_document_id', table_name='jobs')
+    op.drop_table('jobs')
+
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.drop_column('status')
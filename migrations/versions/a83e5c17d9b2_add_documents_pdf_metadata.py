@@ -0,0 +1,56 @@
+"""add documents pdf metadata
+
+Revision ID: a83e5c17d9b2
+Revises: f2b87c0d5e41
+Create Date: 2026-10-18 16:05:37.402911
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a83e5c17d9b2'
+down_revision: Union[str, None] = 'f2b87c0d5e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('documents', sa.Column('size_bytes', sa.BigInteger(), nullable=True))
+    op.add_column('documents', sa.Column('pdf_version', sa.String(length=10), nullable=True))
+    op.add_column('documents', sa.Column('producer', sa.String(length=255), nullable=True))
+    op.add_column('documents', sa.Column('encrypted', sa.Boolean(), nullable=True))
+    op.add_column(
+        'documents',
+        sa.Column('text_stored', sa.Boolean(), nullable=False, server_default=sa.false())
+    )
+    # Until now page_count was only set by eager extraction, together with the pages.
+    op.execute("UPDATE documents SET text_stored = page_count IS NOT NULL")
+
+    op.create_table(
+        'document_page_sizes',
+        sa.Column('id', sa.Integer(), nullable=False, autoincrement=True),
+        sa.Column('document_id', sa.Integer(), nullable=False),
+        sa.Column('first_page', sa.Integer(), nullable=False),
+        sa.Column('last_page', sa.Integer(), nullable=False),
+        sa.Column('width', sa.Float(), nullable=False),
+        sa.Column('height', sa.Float(), nullable=False),
+
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+        sa.UniqueConstraint('document_id', 'first_page')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('document_page_sizes')
+
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.drop_column('text_stored')
+        batch_op.drop_column('encrypted')
+        batch_op.drop_column('producer')
+        batch_op.drop_column('pdf_version')
+        batch_op.drop_column('size_bytes')
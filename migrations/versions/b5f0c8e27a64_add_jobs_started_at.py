@@ -0,0 +1,29 @@
+"""add jobs started at
+
+Revision ID: b5f0c8e27a64
+Revises: a83e5c17d9b2
+Create Date: 2026-10-18 18:22:41.905316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5f0c8e27a64'
+down_revision: Union[str, None] = 'a83e5c17d9b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('started_at', sa.DateTime(timezone=False), nullable=True))
+    # Jobs left running by a previous version count as claimed at their last update.
+    op.execute("UPDATE jobs SET started_at = updated_at WHERE status = 'running'")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_column('started_at')
@@ -0,0 +1,27 @@
+"""add documents listing indexes
+
+Revision ID: c7a3d5e90f16
+Revises: 9b4c1e7f2d08
+Create Date: 2026-10-18 11:24:37.550912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a3d5e90f16'
+down_revision: Union[str, None] = '9b4c1e7f2d08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_documents_name', 'documents', ['name'])
+    op.create_index('ix_documents_created_at_id', 'documents', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_created_at_id', table_name='documents')
+    op.drop_index('ix_documents_name', table_name='documents')
@@ -0,0 +1,46 @@
+"""add document pages search index
+
+Revision ID: e4f19a6b3c27
+Revises: c7a3d5e90f16
+Create Date: 2026-10-18 12:02:11.804316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4f19a6b3c27'
+down_revision: Union[str, None] = 'c7a3d5e90f16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS document_pages_fts "
+            "USING fts5(text, document_id UNINDEXED, page_number UNINDEXED)"
+        )
+        op.execute(
+            "INSERT INTO document_pages_fts (rowid, text, document_id, page_number) "
+            "SELECT id, text, document_id, page_number FROM document_pages"
+        )
+    elif dialect == 'postgresql':
+        op.create_index(
+            'ix_document_pages_text_fts', 'document_pages',
+            [sa.text("to_tsvector('simple', text)")], postgresql_using='gin'
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS document_pages_fts")
+    elif dialect == 'postgresql':
+        op.drop_index('ix_document_pages_text_fts', table_name='document_pages')
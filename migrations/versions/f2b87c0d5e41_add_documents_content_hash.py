@@ -0,0 +1,46 @@
+"""add documents content hash
+
+Revision ID: f2b87c0d5e41
+Revises: e4f19a6b3c27
+Create Date: 2026-10-18 12:41:53.218760
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b87c0d5e41'
+down_revision: Union[str, None] = 'e4f19a6b3c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Names the unnamed unique constraint on documents.path when SQLite tables are reflected.
+naming_convention = {
+    'uq': 'uq_%(table_name)s_%(column_0_name)s',
+}
+
+
+def path_constraint_name() -> str:
+    if op.get_bind().dialect.name == 'postgresql':
+        return 'documents_path_key'
+    return 'uq_documents_path'
+
+
+def upgrade() -> None:
+    # Deduplicated documents share the stored object, so paths are no longer unique.
+    with op.batch_alter_table('documents', naming_convention=naming_convention) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.drop_constraint(path_constraint_name(), type_='unique')
+
+    op.create_index('ix_documents_content_hash', 'documents', ['content_hash'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_documents_content_hash', table_name='documents')
+
+    with op.batch_alter_table('documents', naming_convention=naming_convention) as batch_op:
+        batch_op.create_unique_constraint(path_constraint_name(), ['path'])
+        batch_op.drop_column('content_hash')
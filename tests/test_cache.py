@@ -0,0 +1,109 @@
+import os
+
+from flask import Flask
+
+from app.cache import MemoryCacheBackend, DiskCacheBackend, ObjectCache, TieredCacheBackend
+
+def test_memory_backend_evicts_least_recently_used_by_size():
+    backend = MemoryCacheBackend(max_bytes=10)
+    backend.set((1, 'a.pdf', 1, 'v'), 'aaaa')
+    backend.set((1, 'a.pdf', 2, 'v'), 'bbbb')
+
+    # Touch the first entry so the second one becomes the eviction candidate.
+    assert backend.get((1, 'a.pdf', 1, 'v')) == 'aaaa'
+    backend.set((2, 'b.pdf', 1, 'v'), 'cccc')
+
+    assert backend.get((1, 'a.pdf', 2, 'v')) is None
+    assert backend.get((1, 'a.pdf', 1, 'v')) == 'aaaa'
+    assert backend.get((2, 'b.pdf', 1, 'v')) == 'cccc'
+    assert backend.size == 8
+
+def test_memory_backend_invalidates_a_single_document():
+    backend = MemoryCacheBackend(max_bytes=100)
+    backend.set((1, 'a.pdf', 1, 'v'), 'aaaa')
+    backend.set((2, 'b.pdf', 1, 'v'), 'bbbb')
+
+    backend.invalidate(1)
+
+    assert backend.get((1, 'a.pdf', 1, 'v')) is None
+    assert backend.get((2, 'b.pdf', 1, 'v')) == 'bbbb'
+    assert backend.size == 4
+
+def test_tiered_backend_promotes_disk_hits(tmp_path):
+    disk = DiskCacheBackend(str(tmp_path))
+    disk.set((1, 'a.pdf', 1, 'v'), 'from disk')
+    backend = TieredCacheBackend(MemoryCacheBackend(max_bytes=100), disk)
+
+    assert backend.get((1, 'a.pdf', 1, 'v')) == 'from disk'
+    assert backend.memory.get((1, 'a.pdf', 1, 'v')) == 'from disk'
+
+    backend.invalidate(1)
+    assert backend.get((1, 'a.pdf', 1, 'v')) is None
+
+def test_object_cache_reads_through_and_evicts(tmp_path):
+    app = Flask(__name__)
+    app.config['OBJECT_CACHE_MAX_BYTES'] = 10
+    app.config['OBJECT_CACHE_FOLDER'] = str(tmp_path)
+    cache = ObjectCache(app)
+    fetched = []
+
+    def fetcher(key):
+        def fetch(f):
+            fetched.append(key)
+            f.write(b'123456')
+        return fetch
+
+    with app.app_context():
+        path = cache.get_path('a.pdf', fetcher('a.pdf'))
+        assert open(path, 'rb').read() == b'123456'
+        assert cache.get_path('a.pdf', fetcher('a.pdf')) == path
+        assert fetched == ['a.pdf']
+
+        # Both objects don't fit, so the least recently used one goes.
+        os.utime(path, (0, 0))
+        cache.get_path('b.pdf', fetcher('b.pdf'))
+        assert not os.path.exists(path)
+
+        assert cache.stats() == {'hits': 1, 'misses': 2}
+
+def test_object_cache_returns_objects_larger_than_the_cache(tmp_path):
+    app = Flask(__name__)
+    app.config['OBJECT_CACHE_MAX_BYTES'] = 5
+    app.config['OBJECT_CACHE_FOLDER'] = str(tmp_path)
+    cache = ObjectCache(app)
+
+    with app.app_context():
+        path = cache.get_path('big.pdf', lambda f: f.write(b'0123456789'))
+        assert open(path, 'rb').read() == b'0123456789'
+
+        # The next fetch evicts it, but the lock files are left alone.
+        other = cache.get_path('other.pdf', lambda f: f.write(b'0123456789'))
+        assert not os.path.exists(path)
+        assert os.path.exists(other)
+        assert os.path.exists(cache._lock_path(path))
+
+def test_object_cache_lock_files_are_bounded(tmp_path):
+    from app.cache import OBJECT_CACHE_LOCK_STRIPES
+
+    app = Flask(__name__)
+    app.config['OBJECT_CACHE_MAX_BYTES'] = 5
+    app.config['OBJECT_CACHE_FOLDER'] = str(tmp_path)
+    cache = ObjectCache(app)
+
+    with app.app_context():
+        for i in range(OBJECT_CACHE_LOCK_STRIPES * 2):
+            cache.get_path(f'{i}.pdf', lambda f: f.write(b'0123'))
+
+    names = os.listdir(tmp_path)
+    assert len([name for name in names if not name.startswith('.')]) == 1
+    assert len([name for name in names if name.startswith('.lock-')]) <= OBJECT_CACHE_LOCK_STRIPES
+
+def test_text_cache_key_changes_with_the_stored_file():
+    from types import SimpleNamespace
+    from app.cache import TextCache
+
+    document = SimpleNamespace(id=1, unique_name='a.pdf', path='uploads/a.pdf')
+    key = TextCache.make_key(document, 1)
+
+    document.path = 'uploads/b.pdf'
+    assert TextCache.make_key(document, 1) != key
@@ -0,0 +1,106 @@
+import gzip
+import json
+import os
+import zlib
+
+import pytest
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from app import create_app, db
+from app.database.factories.DocumentFactory import DocumentFactory
+
+class TestConfig:
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    UPLOAD_FOLDER = 'test_uploads'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    STORAGE_TYPE = 'local'
+    PDF_EXTRACT_WORKERS = 1
+    LOG_FILE = ''
+
+@pytest.fixture
+def app():
+    app = create_app(config_class=TestConfig)
+    os.makedirs('test_uploads', exist_ok=True)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def create_pdf(path, number_of_pages):
+    c = canvas.Canvas(path, pagesize=letter)
+    for page in range(1, number_of_pages + 1):
+        for line in range(40):
+            c.drawString(50, 750 - line * 15, f"Page {page}, line {line}: some filler text.")
+        c.showPage()
+    c.save()
+
+def test_large_responses_are_gzipped_and_small_ones_are_not(app, client):
+    for _ in range(30):
+        DocumentFactory()
+    db.session.commit()
+
+    response = client.get('/documents/?limit=30', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) == len(response.data)
+    assert len(json.loads(gzip.decompress(response.data))) == 30
+
+    response = client.get('/documents/?limit=1', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.get_json()) == 1
+
+    response = client.get('/documents/?limit=30', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+
+def test_text_is_compressed_once_per_etag(app, client, monkeypatch):
+    document = DocumentFactory()
+    document.path = os.path.join('test_uploads', document.unique_name)
+    db.session.commit()
+    create_pdf(document.path, 1)
+
+    first = client.get(f'/pdf-text/{document.id}?page=1', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert "Page 1, line 39" in json.loads(gzip.decompress(first.data))['text']
+
+    def fail(*args):
+        raise AssertionError("recompressed a cached body")
+
+    encoder = app.extensions['compression']['encoders'][-1]
+    monkeypatch.setattr(encoder, 'compress', fail)
+    second = client.get(f'/pdf-text/{document.id}?page=1', headers={'Accept-Encoding': 'gzip'})
+    assert second.data == first.data
+
+    os.remove(document.path)
+
+def test_streamed_pages_are_compressed_chunk_by_chunk(app, client):
+    document = DocumentFactory()
+    document.path = os.path.join('test_uploads', document.unique_name)
+    db.session.commit()
+    create_pdf(document.path, 3)
+
+    response = client.get(
+        f'/pdf-text/{document.id}?pages=all',
+        headers={'Accept': 'application/x-ndjson', 'Accept-Encoding': 'gzip'},
+        buffered=False
+    )
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+
+    # Every chunk ends on a sync flush, so each page decompresses on arrival.
+    decompressor = zlib.decompressobj(31)
+    pages = []
+    for chunk in response.response:
+        data = decompressor.decompress(chunk)
+        if data:
+            pages.append(json.loads(data)['page'])
+    response.close()
+
+    assert pages == [1, 2, 3]
+    os.remove(document.path)
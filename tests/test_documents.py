@@ -9,7 +9,7 @@ import pytest
 from app import create_app
 from app.database.factories.DocumentFactory import DocumentFactory
 from app.extensions import db
-from app.models import Document
+from app.models import Document, DocumentPage, Job
 
 class TestConfig:
     TESTING = True
@@ -174,6 +174,7 @@ def test_can_patch_document_successfully(client):
     response_json = response.get_json()
     assert response_json['name'] == expected_name
 
+@mock_aws
 def test_can_delete_document_successfully(client):
     document = DocumentFactory()
     db.session.commit()
@@ -195,3 +196,600 @@ def test_upload_file_too_large(app, client):
         'status': 'error',
         'result': 'File exceeds size limit of 4MB'
     }
+
+def test_upload_extracts_pages_eagerly(app, client, monkeypatch):
+    app.config['STORAGE_TYPE'] = 'local'
+    app.config['PDF_EAGER_EXTRACTION'] = True
+
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    pdf = BytesIO()
+    c = canvas.Canvas(pdf, pagesize=letter)
+    c.drawString(100, 750, "First page.")
+    c.showPage()
+    c.drawString(100, 750, "Second page.")
+    c.showPage()
+    c.save()
+    pdf.seek(0)
+
+    response = client.post('/documents/', data={'file': (pdf, 'eager.pdf')}, content_type='multipart/form-data')
+    assert response.status_code == 200
+    response_json = response.get_json()
+    assert response_json['page_count'] == 2
+    assert response_json['text_stored'] is True
+
+    # Reads must be served from the database, without the stored file.
+    os.remove(response_json['path'])
+
+    response = client.get(f"/pdf-text/{response_json['id']}?page=2")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['number_of_pages'] == 2
+    assert "Second page." in data['text']
+
+    response = client.delete(f"/documents/{response_json['id']}")
+    assert response.status_code == 204
+    assert db.session.query(DocumentPage).count() == 0
+
+def test_upload_file_asynchronously(app, client, monkeypatch):
+    from app.jobs import job_queue
+
+    app.config['STORAGE_TYPE'] = 'local'
+    app.config['UPLOAD_ASYNC'] = True
+    app.config['JOBS_POLL_INTERVAL'] = 0
+
+    test_uuid = uuid.uuid4()
+    monkeypatch.setattr(uuid, 'uuid4', lambda: test_uuid)
+
+    response = client.post('/documents/', data={
+        'file': (BytesIO(b"dummy data"), 'test.txt')
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 202
+    response_json = response.get_json()
+    assert response_json['document']['status'] == 'pending'
+
+    job_queue.wait(timeout=10)
+
+    response = client.get(f"/documents/{response_json['document']['id']}/status")
+    assert response.status_code == 200
+    status = response.get_json()
+    assert status['status'] == 'ready'
+    assert status['job']['id'] == response_json['job_id']
+    assert status['job']['status'] == 'done'
+    assert os.path.exists(os.path.join('test_uploads', f"cleaned-{test_uuid}_test.txt"))
+
+@mock_aws
+def test_uploads_share_one_storage_client(app, client):
+    from app.storage import storage_clients
+
+    conn = boto3.resource("s3", region_name="us-east-1")
+    conn.create_bucket(Bucket=TestConfig.STORAGE_DOCUMENTS_BUCKET)
+
+    for _ in range(3):
+        response = client.post('/documents/', data={
+            'file': (BytesIO(b"dummy data"), 'test.txt')
+        }, content_type='multipart/form-data')
+        assert response.status_code == 200
+
+    assert storage_clients.stats() == {
+        'clients_created': 1,
+        'clients_reused': 2,
+    }
+
+@mock_aws
+def test_upload_file_streams_to_s3_without_local_files(app, client, monkeypatch):
+    app.config['STORAGE_STREAMING_UPLOAD'] = True
+    app.config['PDF_SANITIZE'] = True
+
+    conn = boto3.resource("s3", region_name="us-east-1")
+    conn.create_bucket(Bucket=TestConfig.STORAGE_DOCUMENTS_BUCKET)
+
+    test_uuid = uuid.uuid4()
+    monkeypatch.setattr(uuid, 'uuid4', lambda: test_uuid)
+
+    from reportlab.pdfgen import canvas
+
+    pdf = BytesIO()
+    c = canvas.Canvas(pdf)
+    c.drawString(100, 750, "Streamed page.")
+    c.showPage()
+    c.save()
+    pdf.seek(0)
+
+    saved_paths = []
+    monkeypatch.setattr('werkzeug.datastructures.FileStorage.save', lambda self, dst, *args: saved_paths.append(dst))
+
+    response = client.post('/documents/', data={'file': (pdf, 'stream.pdf')}, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    assert saved_paths == []
+    body = conn.Object(TestConfig.STORAGE_DOCUMENTS_BUCKET, f"{test_uuid}_stream.pdf").get()["Body"].read()
+    assert body.startswith(b"%PDF")
+
+def test_list_documents_with_cursor_pagination(client):
+    documents = [DocumentFactory(name=f'report-{i}.pdf') for i in range(3)]
+    DocumentFactory(name='invoice.pdf')
+    db.session.commit()
+
+    response = client.get('/documents/?limit=2&name_prefix=report-&fields=name')
+    assert response.status_code == 200
+    assert response.get_json() == [{'name': documents[0].name}, {'name': documents[1].name}]
+    cursor = response.headers['X-Next-Cursor']
+    assert 'rel="next"' in response.headers['Link']
+
+    response = client.get(f'/documents/?limit=2&name_prefix=report-&fields=name&cursor={cursor}')
+    assert response.status_code == 200
+    assert response.get_json() == [{'name': documents[2].name}]
+    assert 'X-Next-Cursor' not in response.headers
+
+def test_list_documents_ordered_by_created_at(client):
+    documents = [DocumentFactory() for _ in range(3)]
+    db.session.commit()
+
+    response = client.get('/documents/?limit=1&order=created_at&fields=id')
+    ids = [row['id'] for row in response.get_json()]
+    while 'X-Next-Cursor' in response.headers:
+        response = client.get(f"/documents/?limit=1&order=created_at&fields=id&cursor={response.headers['X-Next-Cursor']}")
+        ids.extend(row['id'] for row in response.get_json())
+
+    assert ids == [document.id for document in documents]
+
+def test_cant_list_documents_with_invalid_parameters(client):
+    for query in ['limit=0', 'fields=secret', 'cursor=nope', 'created_after=yesterday', 'order=name']:
+        response = client.get(f'/documents/?{query}')
+        assert response.status_code == 422
+
+def test_search_documents_by_page_text(client):
+    invoice = DocumentFactory()
+    invoice.pages = [
+        DocumentPage(page_number=1, text='Cover page'),
+        DocumentPage(page_number=2, text='Invoice total due: 42 EUR'),
+    ]
+    report = DocumentFactory()
+    report.pages = [DocumentPage(page_number=1, text='Quarterly report, no invoice "here"')]
+    db.session.commit()
+
+    response = client.get('/documents/search?q=invoice total')
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [(hit['document_id'], hit['page']) for hit in results] == [(invoice.id, 2)]
+    assert '<b>Invoice</b>' in results[0]['snippet']
+    assert results[0]['document_name'] == invoice.name
+
+    # Quotes and FTS operators in the query are searched as plain words.
+    response = client.get('/documents/search?q="here" AND')
+    assert response.status_code == 200
+
+    db.session.delete(invoice)
+    db.session.commit()
+    response = client.get('/documents/search?q=invoice')
+    assert [hit['document_id'] for hit in response.get_json()['results']] == [report.id]
+
+def test_cant_search_documents_without_query(client):
+    assert client.get('/documents/search').status_code == 422
+    assert client.get('/documents/search?q=x&limit=0').status_code == 422
+
+def test_duplicate_uploads_reuse_stored_document(app, client, monkeypatch):
+    import hashlib
+    from app.components import documents as documents_module
+
+    app.config['STORAGE_TYPE'] = 'local'
+    app.config['PDF_EAGER_EXTRACTION'] = True
+    app.config['UPLOAD_DEDUPLICATE'] = True
+
+    from reportlab.pdfgen import canvas
+
+    pdf = BytesIO()
+    c = canvas.Canvas(pdf)
+    c.drawString(100, 750, "Deduplicated page.")
+    c.showPage()
+    c.save()
+    content = pdf.getvalue()
+    content_hash = hashlib.sha256(content).hexdigest()
+
+    extractions = []
+    extract_all_pages = documents_module.extract_all_pages
+    monkeypatch.setattr(documents_module, 'extract_all_pages', lambda path: extractions.append(path) or extract_all_pages(path))
+
+    first = client.post('/documents/', data={'file': (BytesIO(content), 'first.pdf')}, content_type='multipart/form-data').get_json()
+    second = client.post('/documents/', data={'file': (BytesIO(content), 'second.pdf')}, content_type='multipart/form-data').get_json()
+
+    assert len(extractions) == 1
+    assert first['content_hash'] == second['content_hash'] == content_hash
+    assert first['unique_name'] == second['unique_name'] == f"{content_hash}.pdf"
+    assert first['path'] == second['path']
+    assert second['id'] != first['id']
+    assert second['name'] == 'second.pdf'
+    assert second['page_count'] == 1
+
+    response = client.get(f"/pdf-text/{second['id']}?page=1")
+    assert "Deduplicated page." in response.get_json()['text']
+
+    os.remove(first['path'])
+
+def test_batch_upload_of_files_and_archive(app, client):
+    import tarfile
+
+    app.config['STORAGE_TYPE'] = 'local'
+    app.config['UPLOAD_DEDUPLICATE'] = True
+
+    archive = BytesIO()
+    with tarfile.open(fileobj=archive, mode='w:gz') as tar_file:
+        for name, content in [('archived/one.txt', b"same data"), ('archived/image.exe', b"binary")]:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar_file.addfile(info, BytesIO(content))
+    archive.seek(0)
+
+    response = client.post('/documents/batch', data={
+        'files': [(BytesIO(b"first file"), 'first.txt'), (BytesIO(b"same data"), 'second.txt')],
+        'archive': (archive, 'batch.tar.gz'),
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['name'] for result in results] == ['first.txt', 'second.txt', 'archived/one.txt', 'archived/image.exe']
+    assert [result['status'] for result in results] == ['ready', 'ready', 'ready', 'error']
+    assert results[3]['result'] == 'File not allowed'
+
+    # Identical files of the same batch share the stored object.
+    assert results[2]['document']['name'] == 'one.txt'
+    assert results[2]['document']['path'] == results[1]['document']['path']
+    assert db.session.query(Document).count() == 3
+
+    for result in results[:2]:
+        os.remove(result['document']['path'])
+
+def test_cant_batch_upload_without_files(client):
+    response = client.post('/documents/batch', data={}, content_type='multipart/form-data')
+    assert response.status_code == 422
+
+    response = client.post('/documents/batch', data={
+        'archive': (BytesIO(b"not an archive"), 'batch.zip')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 422
+
+def test_bulk_get_and_patch_documents(client):
+    documents = [DocumentFactory(name=f'document-{i}.pdf') for i in range(3)]
+    db.session.commit()
+    ids = [document.id for document in documents]
+
+    response = client.post('/documents/bulk-get', json={'ids': [ids[2], ids[0], 999]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [document['id'] for document in data['documents']] == [ids[2], ids[0]]
+    assert data['missing'] == [999]
+
+    response = client.post('/documents/bulk-patch', json={'documents': [
+        {'id': ids[0], 'name': 'renamed-0.pdf'},
+        {'id': ids[1], 'name': 'renamed-1.pdf'},
+        {'id': 999, 'name': 'missing.pdf'},
+    ]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [document['name'] for document in data['documents']] == ['renamed-0.pdf', 'renamed-1.pdf']
+    assert data['missing'] == [999]
+    assert db.session.get(Document, ids[2]).name == 'document-2.pdf'
+
+    response = client.post('/documents/bulk-patch', json={'documents': [{'id': ids[0], 'status': 'ready'}]})
+    assert response.status_code == 422
+
+@mock_aws
+def test_bulk_delete_removes_rows_and_unreferenced_objects(app, client):
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.create_bucket(Bucket='test_bucket')
+    for key in ('shared.pdf', 'own.pdf'):
+        s3.put_object(Bucket='test_bucket', Key=key, Body=b'%PDF')
+
+    shared = [DocumentFactory(unique_name='shared.pdf') for _ in range(2)]
+    own = DocumentFactory(unique_name='own.pdf')
+    own.pages = [DocumentPage(page_number=1, text='Own page.')]
+    db.session.commit()
+
+    response = client.post('/documents/bulk-delete', json={'ids': [shared[0].id, own.id, 999]})
+    assert response.status_code == 200
+    assert response.get_json() == {'deleted': [shared[0].id, own.id], 'missing': [999]}
+
+    assert db.session.query(Document).count() == 1
+    assert db.session.query(DocumentPage).count() == 0
+    # The object still used by the remaining document is kept.
+    keys = [item['Key'] for item in s3.list_objects_v2(Bucket='test_bucket')['Contents']]
+    assert keys == ['shared.pdf']
+
+def test_get_document_answers_304_until_it_changes(client):
+    document = DocumentFactory()
+    db.session.commit()
+
+    response = client.get(f'/documents/{document.id}')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    last_modified = response.headers['Last-Modified']
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    response = client.get(f'/documents/{document.id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+    response = client.get(f'/documents/{document.id}', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+    client.post('/documents/bulk-patch', json={'documents': [{'id': document.id, 'name': 'renamed.pdf'}]})
+
+    response = client.get(f'/documents/{document.id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['name'] == 'renamed.pdf'
+
+def test_download_local_file_with_ranges(app, client):
+    app.config['STORAGE_TYPE'] = 'local'
+    path = os.path.join('test_uploads', 'download.pdf')
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4 0123456789")
+
+    document = DocumentFactory(name='download.pdf', path=path)
+    db.session.commit()
+
+    response = client.get(f'/documents/{document.id}/file')
+    assert response.status_code == 200
+    assert response.data == b"%PDF-1.4 0123456789"
+    assert response.mimetype == 'application/pdf'
+    assert response.headers['Content-Disposition'] == 'inline; filename="download.pdf"'
+    etag = response.headers['ETag']
+
+    response = client.get(f'/documents/{document.id}/file', headers={'Range': 'bytes=9-12'})
+    assert response.status_code == 206
+    assert response.data == b"0123"
+    assert response.headers['Content-Range'] == 'bytes 9-12/19'
+
+    response = client.get(f'/documents/{document.id}/file', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    response = client.get(f'/documents/{document.id}/file', headers={'Range': 'bytes=100-'})
+    assert response.status_code == 416
+
+@mock_aws
+def test_download_file_streams_or_redirects_in_minio_mode(app, client):
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.create_bucket(Bucket='test_bucket')
+    s3.put_object(Bucket='test_bucket', Key='stored.pdf', Body=b"%PDF-1.4 0123456789")
+
+    document = DocumentFactory(name='stored.pdf', unique_name='stored.pdf')
+    db.session.commit()
+
+    response = client.get(f'/documents/{document.id}/file?download=1')
+    assert response.status_code == 200
+    assert response.data == b"%PDF-1.4 0123456789"
+    assert response.headers['Content-Disposition'] == 'attachment; filename="stored.pdf"'
+
+    response = client.get(f'/documents/{document.id}/file', headers={'Range': 'bytes=9-'})
+    assert response.status_code == 206
+    assert response.data == b"0123456789"
+    assert response.headers['Content-Range'] == 'bytes 9-18/19'
+
+    response = client.get(f'/documents/{document.id}/file', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+    app.config['STORAGE_DOWNLOAD_REDIRECT'] = True
+    response = client.get(f'/documents/{document.id}/file')
+    assert response.status_code == 302
+    assert 'stored.pdf' in response.headers['Location']
+    assert 'Signature' in response.headers['Location']
+
+def test_upload_stores_pdf_metadata(app, client):
+    from reportlab.lib.pagesizes import A4, letter
+    from reportlab.pdfgen import canvas
+
+    app.config['STORAGE_TYPE'] = 'local'
+
+    pdf = BytesIO()
+    c = canvas.Canvas(pdf, pagesize=letter)
+    for size in (letter, letter, A4):
+        c.setPageSize(size)
+        c.drawString(100, 750, "Some text.")
+        c.showPage()
+    c.save()
+    size_bytes = len(pdf.getvalue())
+    pdf.seek(0)
+
+    response = client.post('/documents/', data={'file': (pdf, 'sized.pdf')}, content_type='multipart/form-data')
+    assert response.status_code == 200
+    document = response.get_json()
+    assert document['page_count'] == 3
+    assert document['size_bytes'] == size_bytes
+    assert document['pdf_version'] == '1.3'
+    assert document['producer'].startswith('ReportLab')
+    assert document['encrypted'] is False
+
+    response = client.get(f"/documents/{document['id']}")
+    assert response.get_json()['page_sizes'] == [
+        {'first_page': 1, 'last_page': 2, 'width': 612.0, 'height': 792.0},
+        {'first_page': 3, 'last_page': 3, 'width': 595.28, 'height': 841.89},
+    ]
+
+    os.remove(document['path'])
+
+def test_download_refuses_files_outside_the_upload_folder(app, client):
+    app.config['STORAGE_TYPE'] = 'local'
+    document = DocumentFactory(name='secret.txt', path=os.path.abspath(__file__))
+    db.session.commit()
+
+    response = client.get(f'/documents/{document.id}/file')
+    assert response.status_code == 404
+
+    document.path = os.path.join('test_uploads', '..', 'tests', os.path.basename(__file__))
+    db.session.commit()
+    response = client.get(f'/documents/{document.id}/file')
+    assert response.status_code == 404
+
+def test_delete_never_removes_files_outside_the_upload_folder(app, client, tmp_path):
+    app.config['STORAGE_TYPE'] = 'local'
+    outside = tmp_path / 'keep.txt'
+    outside.write_bytes(b'keep me')
+    inside = os.path.join('test_uploads', 'own.pdf')
+    with open(inside, 'wb') as f:
+        f.write(b'%PDF')
+
+    documents = [
+        DocumentFactory(unique_name='keep.txt', path=str(outside)),
+        DocumentFactory(unique_name='own.pdf', path=inside),
+    ]
+    db.session.commit()
+
+    response = client.post('/documents/bulk-patch', json={'documents': [{'id': documents[1].id, 'path': str(outside)}]})
+    assert response.status_code == 422
+
+    response = client.post('/documents/bulk-delete', json={'ids': [document.id for document in documents]})
+    assert response.status_code == 200
+    assert outside.exists()
+    assert not os.path.exists(inside)
+
+def test_lazily_extracted_documents_skip_the_pages_table(app, client, monkeypatch):
+    from reportlab.pdfgen import canvas
+    from app.components import pdf_toolset as pdf_toolset_module
+
+    app.config['STORAGE_TYPE'] = 'local'
+    app.config['PDF_EAGER_EXTRACTION'] = False
+
+    pdf = BytesIO()
+    c = canvas.Canvas(pdf)
+    for page in (1, 2):
+        c.drawString(100, 750, f"Lazy page {page}.")
+        c.showPage()
+    c.save()
+    pdf.seek(0)
+
+    response = client.post('/documents/', data={'file': (pdf, 'lazy.pdf')}, content_type='multipart/form-data')
+    document = response.get_json()
+    assert document['page_count'] == 2
+    assert document['text_stored'] is False
+
+    def fail(*args):
+        raise AssertionError("document_pages must not be queried")
+    monkeypatch.setattr(pdf_toolset_module, 'get_stored_page_text', fail)
+    monkeypatch.setattr(pdf_toolset_module, 'get_stored_pages_text', fail)
+
+    response = client.get(f"/pdf-text/{document['id']}?page=2")
+    assert response.status_code == 200
+    assert "Lazy page 2." in response.get_json()['text']
+    response = client.get(f"/pdf-text/{document['id']}?pages=1-2")
+    assert response.status_code == 200
+
+    os.remove(document['path'])
+
+def test_lazily_extracted_pages_are_searchable(app, client):
+    from reportlab.pdfgen import canvas
+
+    app.config['STORAGE_TYPE'] = 'local'
+
+    pdf = BytesIO()
+    c = canvas.Canvas(pdf)
+    for text in ("Nothing here.", "Quarterly invoice summary."):
+        c.drawString(100, 750, text)
+        c.showPage()
+    c.save()
+    pdf.seek(0)
+
+    document = client.post('/documents/', data={'file': (pdf, 'lazy.pdf')}, content_type='multipart/form-data').get_json()
+    assert client.get('/documents/search?q=invoice').get_json()['results'] == []
+
+    assert client.get(f"/pdf-text/{document['id']}?page=2").status_code == 200
+    results = client.get('/documents/search?q=invoice').get_json()['results']
+    assert [(hit['document_id'], hit['page']) for hit in results] == [(document['id'], 2)]
+
+    # Pages extracted again (e.g. after a cache eviction) aren't stored twice.
+    assert client.get(f"/pdf-text/{document['id']}?pages=1-2").status_code == 200
+    assert db.session.query(DocumentPage).filter_by(document_id=document['id']).count() == 2
+
+    os.remove(document['path'])
+
+def test_name_prefix_is_matched_literally(client):
+    for name in ('50%_off.pdf', '50x_off.pdf', '50%', '51.pdf', '5'):
+        DocumentFactory(name=name)
+    db.session.commit()
+
+    response = client.get('/documents/?name_prefix=50%25&fields=name')
+    assert sorted(document['name'] for document in response.get_json()) == ['50%', '50%_off.pdf']
+
+def test_jobs_with_an_expired_lease_are_requeued_then_failed(app):
+    from datetime import datetime, timedelta
+    from app.jobs import pending_job_ids, requeue_expired_jobs
+
+    app.config['JOBS_LEASE_TIMEOUT'] = 60
+    app.config['JOBS_MAX_ATTEMPTS'] = 2
+    lost = datetime.utcnow() - timedelta(seconds=120)
+
+    retried = DocumentFactory(status='pending')
+    exhausted = DocumentFactory(status='pending')
+    running = DocumentFactory(status='pending')
+    db.session.add_all([
+        Job(type='process_upload', document_id=retried.id, status='running', attempts=1, started_at=lost),
+        Job(type='process_upload', document_id=exhausted.id, status='running', attempts=2, started_at=lost),
+        Job(type='process_upload', document_id=running.id, status='running', attempts=1, started_at=datetime.utcnow()),
+    ])
+    db.session.commit()
+
+    requeue_expired_jobs()
+
+    jobs = {job.document_id: job for job in db.session.query(Job)}
+    assert jobs[retried.id].status == 'pending'
+    assert jobs[exhausted.id].status == 'failed'
+    assert jobs[running.id].status == 'running'
+    assert pending_job_ids() == [jobs[retried.id].id]
+    assert db.session.get(Document, exhausted.id).status == 'failed'
+    assert db.session.get(Document, retried.id).status == 'pending'
+
+def test_polls_do_not_resubmit_jobs_already_queued(app, monkeypatch):
+    import threading
+    from app.jobs import job_queue
+
+    app.config['JOBS_WORKERS'] = 1
+    app.config['JOBS_POLL_INTERVAL'] = 0
+    document = DocumentFactory(status='pending')
+    jobs = [Job(type='process_upload', document_id=document.id, status='pending') for _ in range(2)]
+    db.session.add_all(jobs)
+    db.session.commit()
+
+    release = threading.Event()
+    ran = []
+    def run(job_id):
+        release.wait(timeout=10)
+        ran.append(job_id)
+    monkeypatch.setattr(job_queue, 'run', run)
+
+    job_queue.reset()
+    job_queue.start()
+    job_queue._submit_pending(app)
+    job_queue._submit_pending(app)
+    assert len(app.extensions['job_queue']['futures']) == 2
+
+    release.set()
+    job_queue.wait(timeout=10)
+    assert ran == [job.id for job in jobs]
+    assert app.extensions['job_queue']['submitted'] == set()
+
+@mock_aws
+def test_failed_bucket_upload_records_no_document(app, client):
+    # No bucket: the upload to storage fails.
+    response = client.post('/documents/', data={
+        'file': (BytesIO(b"dummy data"), 'test.txt')
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 500
+    assert db.session.query(Document).count() == 0
+
+def test_storing_page_text_ignores_pages_stored_concurrently(app):
+    from app.components.pdf_toolset import store_pages_text
+
+    document = DocumentFactory()
+    db.session.add(DocumentPage(document_id=document.id, page_number=1, text="Stored first."))
+    db.session.commit()
+
+    # Page 1 was stored by another request in the meantime: only page 2 is inserted.
+    store_pages_text(document, {1: "Extracted again.", 2: "Quarterly invoice summary."})
+
+    pages = dict(db.session.query(DocumentPage.page_number, DocumentPage.text).filter_by(document_id=document.id))
+    assert pages == {1: "Stored first.", 2: "Quarterly invoice summary."}
+    results = app.test_client().get('/documents/search?q=invoice').get_json()['results']
+    assert [(hit['document_id'], hit['page']) for hit in results] == [(document.id, 2)]
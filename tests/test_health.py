@@ -0,0 +1,91 @@
+import boto3
+from moto import mock_aws
+import pytest
+
+from app import create_app, db
+from app.serving import reset_after_fork, warm_up
+from app.storage import get_client, storage_clients
+
+class TestConfig:
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    UPLOAD_FOLDER = 'test_uploads'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    STORAGE_TYPE = 'minio'
+    STORAGE_URL = None
+    STORAGE_ACCESS_KEY = 'fake_access_key'
+    STORAGE_SECRET_KEY = 'fake_secret_key'
+    STORAGE_REGION = 'us-east-1'
+    STORAGE_DOCUMENTS_BUCKET = 'test_bucket'
+    LOG_FILE = ''
+
+@pytest.fixture
+def app():
+    app = create_app(config_class=TestConfig)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def test_liveness(client):
+    for path in ('/', '/health'):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.get_json() == {'status': 'ok'}
+
+@mock_aws
+def test_readiness_checks_database_and_bucket(client):
+    response = client.get('/ready')
+    assert response.status_code == 503
+    data = response.get_json()
+    assert data['status'] == 'unavailable'
+    assert data['checks']['database'] == 'ok'
+    assert data['checks']['storage'] != 'ok'
+
+    boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='test_bucket')
+
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'ready', 'checks': {'database': 'ok', 'storage': 'ok'}}
+
+def test_workers_build_clients_from_the_preloaded_session(app):
+    warm_up(app)
+    session = app.extensions['storage']['session']
+    assert session is not None
+
+    reset_after_fork(app)
+    client = get_client()
+    assert app.extensions['storage']['session'] is session
+    assert storage_clients.stats()['clients_created'] == 1
+    assert get_client() is client
+
+def test_workers_share_the_cpus_between_extraction_pools(app, monkeypatch):
+    monkeypatch.setattr('os.cpu_count', lambda: 16)
+
+    reset_after_fork(app, server_workers=4)
+    assert app.config['PDF_EXTRACT_WORKERS'] == 4
+
+    app.config['PDF_EXTRACT_WORKERS'] = 0
+    reset_after_fork(app, server_workers=33)
+    assert app.config['PDF_EXTRACT_WORKERS'] == 1
+
+    # An explicit setting is kept.
+    app.config['PDF_EXTRACT_WORKERS'] = 3
+    reset_after_fork(app, server_workers=33)
+    assert app.config['PDF_EXTRACT_WORKERS'] == 3
+
+def test_workers_start_the_job_queue_with_async_uploads(app):
+    reset_after_fork(app)
+    assert app.extensions['job_queue']['executor'] is None
+
+    app.config['UPLOAD_ASYNC'] = True
+    app.config['JOBS_POLL_INTERVAL'] = 0
+    reset_after_fork(app)
+    executor = app.extensions['job_queue']['executor']
+    assert executor is not None
+    executor.shutdown()
@@ -0,0 +1,47 @@
+import json
+import logging
+
+import pytest
+
+from app import create_app, db
+from app.logger import JsonFormatter, RequestQueueHandler
+
+class TestConfig:
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    UPLOAD_FOLDER = 'test_uploads'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    STORAGE_TYPE = 'local'
+    LOG_FILE = ''
+
+@pytest.fixture
+def app():
+    app = create_app(config_class=TestConfig)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def test_request_id_is_echoed_or_generated(client):
+    response = client.get('/documents/', headers={'X-Request-ID': 'abc123'})
+    assert response.headers['X-Request-ID'] == 'abc123'
+
+    response = client.get('/documents/')
+    assert len(response.headers['X-Request-ID']) == 32
+
+def test_json_formatter_keeps_context_separate_from_message():
+    record = logging.LogRecord('app', logging.ERROR, __file__, 1, 'Error listing documents', ({'error': 'boom'},), None)
+    record.request_id = 'abc123'
+
+    prepared = RequestQueueHandler(None).prepare(record)
+    entry = json.loads(JsonFormatter().format(prepared))
+
+    assert entry['message'] == 'Error listing documents'
+    assert entry['context'] == {'error': 'boom'}
+    assert entry['request_id'] == 'abc123'
+    assert entry['level'] == 'ERROR'
@@ -0,0 +1,97 @@
+from reportlab.pdfgen import canvas
+import pytest
+
+from app import create_app, db
+from app.database.factories.DocumentFactory import DocumentFactory
+from app.metrics import Counter, Histogram
+
+class TestConfig:
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    UPLOAD_FOLDER = 'test_uploads'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    STORAGE_TYPE = 'local'
+    PDF_SANITIZE = False
+
+@pytest.fixture
+def app():
+    app = create_app(config_class=TestConfig)
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('test_duration_seconds', 'Test.', ('operation',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, operation='read')
+    histogram.observe(0.5, operation='read')
+    histogram.observe(5, operation='read')
+
+    assert histogram.render() == [
+        '# HELP test_duration_seconds Test.',
+        '# TYPE test_duration_seconds histogram',
+        'test_duration_seconds_bucket{operation="read",le="0.1"} 1',
+        'test_duration_seconds_bucket{operation="read",le="1.0"} 2',
+        'test_duration_seconds_bucket{operation="read",le="+Inf"} 3',
+        'test_duration_seconds_sum{operation="read"} 5.55',
+        'test_duration_seconds_count{operation="read"} 3',
+    ]
+
+def test_counter_escapes_label_values():
+    counter = Counter('test_total', 'Test.', ('name',))
+    counter.inc(name='say "hi"')
+    counter.inc(2, name='say "hi"')
+
+    assert counter.render()[-1] == 'test_total{name="say \\"hi\\""} 3'
+
+def test_metrics_endpoint_reports_request_and_extraction_timings(client, tmp_path):
+    path = tmp_path / 'metrics.pdf'
+    c = canvas.Canvas(str(path))
+    c.drawString(100, 750, "Measured page.")
+    c.showPage()
+    c.save()
+
+    document = DocumentFactory(path=str(path))
+    db.session.commit()
+
+    assert client.get(f'/pdf-text/{document.id}?page=1').status_code == 200
+    assert client.get(f'/pdf-text/{document.id}?page=1').status_code == 200
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{method="GET",endpoint="pdf_toolset.extract_text_from_pdf",status="200"}' in body
+    assert 'db_query_duration_seconds_count{operation="SELECT"}' in body
+    assert 'pdf_parse_duration_seconds_count' in body
+    assert 'pdf_page_extract_duration_seconds_count' in body
+    # The second read finds both the page text and the page count in the cache.
+    assert 'cache_hits_total{cache="text"} 2' in body
+    assert 'cache_hit_ratio{cache="text"} 0.5' in body
+
+def test_workers_sharing_a_store_report_the_same_totals(app, client, tmp_path):
+    from app.metrics import SharedStore, metrics
+
+    counter = Counter('test_shared_total', 'Test.')
+    counter.inc(2)
+
+    # Another worker of the same server, with the same values as this one.
+    app.config['METRICS_SYNC_INTERVAL'] = 3600
+    other = SharedStore(app, str(tmp_path))
+    other.write()
+
+    metrics.share(app, str(tmp_path))
+    assert 'test_shared_total 4' in client.get('/metrics').get_data(as_text=True)
+
+    # Values of a worker that exits are kept, so the counter doesn't go backwards.
+    other.retire()
+    counter.inc()
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'test_shared_total 5' in body
+    assert 'cache_hit_ratio{cache="text"}' in body
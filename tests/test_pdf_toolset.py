@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 import pytest
@@ -7,6 +8,7 @@ from app.database.factories.DocumentFactory import DocumentFactory
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from app import db, create_app
+from app.components.extraction import parse_page_ranges, shutdown_pool
 
 class TestConfig:
     TESTING = True
@@ -87,3 +89,276 @@ def test_extract_text_from_pdf_success(client):
 
     # Clean up the dummy PDF file
     os.remove(dummy_pdf)
+
+@mock_aws
+def test_extract_text_from_pdf_is_served_from_cache(client):
+    document = DocumentFactory()
+    document.path = "uploads/test.pdf"
+    db.session.commit()
+
+    dummy_pdf = document.path
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(dummy_pdf, pagesize=letter)
+    c.drawString(100, 750, "This is a cached PDF file.")
+    c.showPage()
+    c.save()
+
+    response = client.get(f"/pdf-text/{document.id}?page=1")
+    assert response.status_code == 200
+
+    # The file is gone, so a second successful read can only come from the cache.
+    os.remove(dummy_pdf)
+
+    response = client.get(f"/pdf-text/{document.id}?page=1")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['number_of_pages'] == 1
+    assert "This is a cached PDF file." in data['text']
+
+def create_pdf(path, number_of_pages):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=letter)
+    for page in range(1, number_of_pages + 1):
+        c.drawString(100, 750, f"This is page {page}.")
+        c.showPage()
+    c.save()
+
+def test_parse_page_ranges():
+    assert parse_page_ranges("1-3,5,2", 5) == [1, 2, 3, 5]
+    assert parse_page_ranges("all", 3) == [1, 2, 3]
+
+    for invalid in ["0", "4-2", "1-6", "a"]:
+        with pytest.raises(ValueError):
+            parse_page_ranges(invalid, 5)
+
+@mock_aws
+def test_extract_text_from_page_ranges_in_parallel(app, client):
+    app.config['PDF_EXTRACT_WORKERS'] = 2
+    app.config['PDF_PARALLEL_MIN_PAGES'] = 2
+
+    document = DocumentFactory()
+    document.path = "uploads/test.pdf"
+    db.session.commit()
+    create_pdf(document.path, 6)
+
+    try:
+        response = client.get(f"/pdf-text/{document.id}?pages=1-3,5")
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['number_of_pages'] == 6
+        assert [page['page'] for page in data['pages']] == [1, 2, 3, 5]
+        for page in data['pages']:
+            assert f"This is page {page['page']}." in page['text']
+    finally:
+        shutdown_pool()
+        os.remove(document.path)
+
+@mock_aws
+def test_cant_extract_more_pages_than_the_request_limit(app, client):
+    app.config['PDF_MAX_PAGES_PER_REQUEST'] = 2
+
+    document = DocumentFactory()
+    document.path = "uploads/test.pdf"
+    db.session.commit()
+    create_pdf(document.path, 3)
+
+    response = client.get(f"/pdf-text/{document.id}?pages=all")
+    assert response.status_code == 400
+    assert b"Too many pages requested" in response.data
+
+    os.remove(document.path)
+
+@mock_aws
+def test_stream_text_from_page_ranges_as_ndjson(client):
+    document = DocumentFactory()
+    document.path = "uploads/test.pdf"
+    db.session.commit()
+    create_pdf(document.path, 3)
+
+    response = client.get(
+        f"/pdf-text/{document.id}?pages=all",
+        headers={'Accept': 'application/x-ndjson'}
+    )
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [line['page'] for line in lines] == [1, 2, 3]
+    assert all(line['number_of_pages'] == 3 for line in lines)
+    assert "This is page 2." in lines[1]['text']
+
+    os.remove(document.path)
+
+@mock_aws
+def test_consecutive_pages_reuse_the_parsed_reader(client):
+    from app.extensions import reader_cache
+
+    document = DocumentFactory()
+    document.path = "uploads/test.pdf"
+    db.session.commit()
+    create_pdf(document.path, 3)
+
+    for page in (1, 2, 3):
+        response = client.get(f"/pdf-text/{document.id}?page={page}")
+        assert response.status_code == 200
+        assert f"This is page {page}." in response.get_json()['text']
+
+    assert reader_cache.stats()['misses'] == 1
+    assert reader_cache.stats()['hits'] == 2
+
+    # Replacing the file changes its version, so the reader is parsed again.
+    create_pdf(document.path, 4)
+    os.utime(document.path, ns=(0, 0))
+    response = client.get(f"/pdf-text/{document.id}?page=4")
+    assert response.status_code == 200
+    assert "This is page 4." in response.get_json()['text']
+    assert reader_cache.stats()['misses'] == 2
+
+    os.remove(document.path)
+
+def test_revalidated_text_is_answered_without_opening_the_pdf(app, client, monkeypatch):
+    from app.components import pdf_toolset as pdf_toolset_module
+
+    document = DocumentFactory()
+    document.path = "uploads/test.pdf"
+    db.session.commit()
+    create_pdf(document.path, 2)
+
+    response = client.get(f"/pdf-text/{document.id}?page=1")
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.headers['Vary'] == 'Accept, Accept-Encoding'
+
+    # The streamed representation has its own validator.
+    response = client.get(f"/pdf-text/{document.id}?pages=1-2", headers={'Accept': 'application/x-ndjson'})
+    assert response.headers['ETag'] != etag
+    os.remove(document.path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The PDF must not be opened")
+    monkeypatch.setattr(pdf_toolset_module, 'open_reader', fail)
+    monkeypatch.setattr(pdf_toolset_module, 'get_known_pages_text', fail)
+
+    app.config['CACHE_CONTROL_TEXT'] = 'public, max-age=300'
+    response = client.get(f"/pdf-text/{document.id}?page=1", headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['Cache-Control'] == 'public, max-age=300'
+
+def test_extract_page_blocks_as_columns(app, client):
+    from reportlab.pdfgen import canvas
+
+    document = DocumentFactory()
+    document.path = "uploads/test.pdf"
+    db.session.commit()
+
+    c = canvas.Canvas(document.path)
+    c.setFont('Helvetica', 12)
+    c.drawString(100, 750, "Left run")
+    c.drawString(300, 750, "Right run")
+    c.setFont('Times-Bold', 18)
+    c.drawString(100, 700, "Heading")
+    c.showPage()
+    c.save()
+
+    response = client.get(f"/pdf-text/{document.id}?page=1&format=blocks")
+    assert response.status_code == 200
+    blocks = response.get_json()['blocks']
+    os.remove(document.path)
+
+    assert blocks['text'] == ['Left run', 'Right run', 'Heading']
+    assert blocks['x'] == [100.0, 300.0, 100.0]
+    assert blocks['y'] == [750.0, 750.0, 700.0]
+    assert blocks['size'] == [12.0, 12.0, 18.0]
+    assert blocks['fonts'] == ['Helvetica', 'Times-Bold']
+    assert blocks['font'] == [0, 0, 1]
+    assert blocks['line'] == [0, 0, 1]
+
+    # Served from the cache now that the file is gone.
+    response = client.get(f"/pdf-text/{document.id}?pages=1&format=blocks")
+    assert response.status_code == 200
+    assert response.get_json()['pages'][0]['blocks'] == blocks
+
+    assert client.get(f"/pdf-text/{document.id}?page=1&format=html").status_code == 400
+
+def test_out_of_range_page_is_rejected_without_opening_the_pdf(app, client, monkeypatch):
+    from app.components import pdf_toolset as pdf_toolset_module
+
+    document = DocumentFactory(page_count=2)
+    db.session.commit()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("The PDF must not be opened")
+    monkeypatch.setattr(pdf_toolset_module, 'load_pdf_source', fail)
+
+    for page in (0, 3):
+        response = client.get(f"/pdf-text/{document.id}?page={page}")
+        assert response.status_code == 400
+        assert b"out of range 1-2" in response.data
+
+def test_stream_reports_a_failure_to_open_the_pdf_as_an_error_line(app, client, monkeypatch):
+    from app.components import pdf_toolset as pdf_toolset_module
+
+    document = DocumentFactory(page_count=2)
+    db.session.commit()
+
+    def fail(*args, **kwargs):
+        raise OSError("storage unavailable")
+    monkeypatch.setattr(pdf_toolset_module, 'iter_missing_pages', fail)
+
+    response = client.get(f"/pdf-text/{document.id}?pages=1-2", headers={'Accept': 'application/x-ndjson'})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert lines == [{"page": 1, "error": "Failed to extract text from page 1: storage unavailable"}]
+
+def test_parallel_extraction_recovers_from_a_broken_pool(app, client):
+    from concurrent.futures.process import BrokenProcessPool
+    from app.components.extraction import get_pool
+
+    app.config['PDF_EXTRACT_WORKERS'] = 2
+    app.config['PDF_PARALLEL_MIN_PAGES'] = 2
+
+    document = DocumentFactory()
+    document.path = "uploads/test.pdf"
+    db.session.commit()
+    create_pdf(document.path, 4)
+
+    try:
+        # A worker that dies (e.g. OOM-killed) leaves the pool broken.
+        with pytest.raises(BrokenProcessPool):
+            get_pool(2).submit(os._exit, 1).result()
+
+        response = client.get(f"/pdf-text/{document.id}?pages=1-4")
+        assert response.status_code == 200
+        assert [page['page'] for page in response.get_json()['pages']] == [1, 2, 3, 4]
+    finally:
+        shutdown_pool()
+        os.remove(document.path)
+
+def test_parallel_extraction_sends_stored_bytes_to_workers_once(monkeypatch, tmp_path):
+    from app.components import extraction
+
+    path = str(tmp_path / 'test.pdf')
+    create_pdf(path, 4)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    sources = []
+    class InlinePool:
+        def map(self, func, *iterables):
+            for args in zip(*iterables):
+                sources.append(args[0])
+                yield func(*args)
+    monkeypatch.setattr(extraction, 'get_pool', lambda workers: InlinePool())
+
+    pages = list(extraction.iter_pages_parallel(data, [1, 2, 3, 4], workers=2, chunk_size=1))
+    assert [page for page, _ in pages] == [1, 2, 3, 4]
+    assert "This is page 3." in pages[2][1]
+
+    # Every task gets the same temporary file's path instead of a copy of the document.
+    assert len(sources) == 4 and len(set(sources)) == 1
+    assert isinstance(sources[0], str)
+    assert not os.path.exists(sources[0])
@@ -0,0 +1,123 @@
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import DictionaryObject, IndirectObject, NameObject, TextStringObject
+from reportlab.pdfgen import canvas
+
+from app.components.sanitizer import sanitize
+
+def create_pdf(pages=2):
+    pdf = BytesIO()
+    c = canvas.Canvas(pdf)
+    c.setAuthor('Someone')
+    for page in range(1, pages + 1):
+        c.drawString(100, 750, f"Page {page} text.")
+        c.linkURL('https://example.com', (100, 700, 200, 720))
+        c.showPage()
+    c.save()
+    pdf.seek(0)
+    return pdf
+
+def create_pdf_with_actions():
+    writer = PdfWriter(clone_from=create_pdf())
+    writer.add_js("app.alert('hi');")
+    writer.add_attachment('notes.txt', b'attached')
+    writer.open_destination = writer.pages[0]
+    output = BytesIO()
+    writer.write(output)
+    output.seek(0)
+    return output
+
+def test_sanitize_strips_metadata_and_annotations():
+    output = BytesIO()
+    result = sanitize(create_pdf(), output)
+
+    assert result.rewritten
+    assert result.findings == ['metadata', 'annotations']
+    assert result.output_bytes == len(output.getvalue())
+
+    reader = PdfReader(output)
+    assert reader.metadata is None or not reader.metadata.get('/Author')
+    assert all('/Annots' not in page for page in reader.pages)
+    assert [page.extract_text().strip() for page in reader.pages] == ['Page 1 text.', 'Page 2 text.']
+
+def test_sanitize_copies_clean_pdf_unchanged():
+    sanitized = BytesIO()
+    sanitize(create_pdf(), sanitized)
+
+    output = BytesIO()
+    result = sanitize(BytesIO(sanitized.getvalue()), output)
+
+    assert not result.rewritten
+    assert result.findings == []
+    assert result.bytes_saved == 0
+    assert output.getvalue() == sanitized.getvalue()
+
+def test_sanitize_strips_javascript_and_embedded_files_by_default(tmp_path):
+    path = tmp_path / 'actions.pdf'
+    path.write_bytes(create_pdf_with_actions().getvalue())
+
+    stripped = tmp_path / 'stripped.pdf'
+    result = sanitize(str(path), str(stripped))
+    assert {'javascript', 'embedded_files', 'open_action'} <= set(result.findings)
+    root = PdfReader(str(stripped)).trailer['/Root']
+    assert '/JavaScript' not in root.get('/Names', {})
+    assert '/EmbeddedFiles' not in root.get('/Names', {})
+    assert '/OpenAction' not in root
+    assert '/AA' not in root
+
+    # A document whose only findings are active content is rewritten, never copied.
+    sanitized = BytesIO()
+    sanitize(create_pdf(), sanitized)
+    writer = PdfWriter(clone_from=PdfReader(BytesIO(sanitized.getvalue())))
+    writer.add_js("app.alert('hi');")
+    active = BytesIO()
+    writer.write(active)
+    active.seek(0)
+    output = BytesIO()
+    result = sanitize(active, output)
+    assert result.rewritten
+    assert '/JavaScript' not in PdfReader(output).trailer['/Root'].get('/Names', {})
+
+    kept = tmp_path / 'kept.pdf'
+    sanitize(str(path), str(kept), remove_javascript=False, remove_embedded_files=False)
+    names = PdfReader(str(kept)).trailer['/Root']['/Names']
+    assert '/JavaScript' in names and '/EmbeddedFiles' in names
+
+def test_sanitize_resolves_indirect_names():
+    writer = PdfWriter(clone_from=create_pdf())
+    writer.add_named_destination('intro', 0)
+    writer.add_js("app.alert('hi');")
+    pdf = BytesIO()
+    writer.write(pdf)
+    pdf.seek(0)
+    assert isinstance(PdfReader(pdf).trailer['/Root'].raw_get('/Names'), IndirectObject)
+
+    output = BytesIO()
+    result = sanitize(pdf, output)
+    assert 'javascript' in result.findings
+    names = PdfReader(output).trailer['/Root']['/Names']
+    assert '/JavaScript' not in names
+    assert '/Dests' in names
+
+def test_sanitize_strips_javascript_from_bookmarks():
+    sanitized = BytesIO()
+    sanitize(create_pdf(), sanitized)
+    writer = PdfWriter(clone_from=PdfReader(BytesIO(sanitized.getvalue())))
+    item = writer.add_outline_item('Intro', 0).get_object()
+    item[NameObject('/A')] = DictionaryObject({
+        NameObject('/S'): NameObject('/JavaScript'),
+        NameObject('/JS'): TextStringObject("app.alert('hi');"),
+    })
+    pdf = BytesIO()
+    writer.write(pdf)
+    pdf.seek(0)
+
+    output = BytesIO()
+    result = sanitize(pdf, output)
+    assert result.rewritten
+    assert result.findings == ['javascript']
+
+    reader = PdfReader(output)
+    assert [item.title for item in reader.outline] == ['Intro']
+    assert b'/JavaScript' not in output.getvalue()
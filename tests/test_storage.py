@@ -0,0 +1,55 @@
+from io import BytesIO
+import random
+
+import boto3
+from moto import mock_aws
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from app.components.extraction import count_pages, get_page, open_reader
+from app.components.storage import S3RangeReader
+
+BUCKET = 'test_bucket'
+
+def create_pdf_bytes(number_of_pages):
+    pdf = BytesIO()
+    c = canvas.Canvas(pdf, pagesize=letter)
+    for page in range(1, number_of_pages + 1):
+        for line in range(40):
+            c.drawString(50, 750 - line * 15, f"Page {page}, line {line}: some filler text to grow the file.")
+        c.showPage()
+    c.save()
+    return pdf.getvalue()
+
+@mock_aws
+def test_range_reader_matches_the_object_bytes():
+    client = boto3.client('s3', region_name='us-east-1')
+    client.create_bucket(Bucket=BUCKET)
+    data = bytes(random.Random(1).randrange(256) for _ in range(10000))
+    client.put_object(Bucket=BUCKET, Key='blob', Body=data)
+
+    reader = S3RangeReader(client, BUCKET, 'blob', block_size=1024, readahead_blocks=1, max_blocks=3)
+
+    assert reader.seek(0, 2) == len(data)
+    for offset, size in [(0, 10), (1020, 10), (9990, 100), (5000, 3000), (4096, 0)]:
+        reader.seek(offset)
+        assert reader.read(size) == data[offset:offset + size]
+
+    reader.seek(0)
+    assert reader.read() == data
+
+@mock_aws
+def test_range_reader_fetches_only_part_of_a_large_pdf():
+    client = boto3.client('s3', region_name='us-east-1')
+    client.create_bucket(Bucket=BUCKET)
+    data = create_pdf_bytes(200)
+    client.put_object(Bucket=BUCKET, Key='large.pdf', Body=data)
+
+    stream = S3RangeReader(client, BUCKET, 'large.pdf', block_size=8 * 1024)
+    reader = open_reader(stream)
+
+    assert count_pages(reader) == 200
+    assert "Page 3, line 0" in get_page(reader, 3).extract_text()
+    assert stream.bytes_fetched < len(data) / 2
+
+    assert "Page 150, line 0" in get_page(reader, 150).extract_text()